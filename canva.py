@@ -1,293 +1,437 @@
 # type: ignore
-from PySide2.QtCore import Qt, QRect, QPoint
-from PySide2.QtGui import QColor, QPainter, QPen
+from PySide2.QtCore import Qt, QRectF, Signal
+from PySide2.QtGui import QColor, QImage, QPainter
 from PySide2.QtWidgets import QWidget
-import math
+import itertools
+import tempfile
+import time
 
+from geometry import points_rect
+from pages import LAYERS, Page, rebase_layer
+from scene import Scene
+from session import VERSION, encode_stroke
+from strokes import draw_item, stroke_bounds
+from templates import draw_template
+from tools import TOOLS
+from cursors import SizePopup
+from viewport import IDENTITY, Viewport, lod_tolerance
+import cursors
+import palette
 
-def dist(a, b):
-    return math.hypot(a.x() - b.x(), a.y() - b.y())
+CURSOR_ASPECTS = {"tool", "size", "color", "board", "view"}
 
 
-def line_hit(p, a, b, r):
-    ax, ay = a.x(), a.y()
-    bx, by = b.x(), b.y()
-    px, py = p.x(), p.y()
+class Canva(QWidget):
+    drawing_mode_changed = Signal(bool)
+    stroke_added = Signal(object)  # 本機新增的筆畫
+    strokes_removed = Signal(object)  # 本機擦掉的筆畫
+    cleared = Signal(object)  # 本機清空的圖層名稱
+    drawing = Signal(object)  # 本機畫到一半的工具，每次移動都送
 
-    abx, aby = bx - ax, by - ay
-    apx, apy = px - ax, py - ay
-    ab_len = abx * abx + aby * aby
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.scene = Scene(self)
+        self.scene.changed.connect(self.scene_changed)
 
-    if ab_len == 0:
-        return dist(p, a) <= r
+        self.drawing_mode = True
+        self.board_color = (0, 0, 0, 50)
+        self.template = "plain"  # 黑板底紋
 
-    t = max(0, min(1, (apx * abx + apy * aby) / ab_len))
-    cx = ax + t * abx
-    cy = ay + t * aby
+        self.tool = "pen"
+        self.tools = {name: cls() for name, cls in TOOLS.items()}
 
-    return math.hypot(px - cx, py - cy) <= r
+        self.shape = "free"
+        self.thickness = 4
+        self.color = "white"
+        self.pen_color = palette.qcolor("white")
+        self.smoothing = False
+        self.variable_width = False
+        self.recognize = False
+        self.pressure = None  # 繪圖板壓力（0~1），滑鼠時是 None
+
+        self.page_budget = 256 * 1024 * 1024
+        self.history_budget = 64 * 1024 * 1024
+        self.serials = itertools.count()  # 歷史紀錄的編號
+        self.pages = [self.make_page()]
+        self.page_index = 0
+        self.page_clock = 0
+        self.spill_dir = None
+
+        self.viewport = Viewport()
+        self.pan_pos = None
+        self.previews = {}  # 別人畫到一半的筆畫：id -> 筆畫
+
+        self.size_popup = SizePopup(self)
+        self.update_cursor()
 
+        self.add_history_snapshot()
 
-def rect_hit(p, rect, r):
-    x = max(rect.left(), min(p.x(), rect.right()))
-    y = max(rect.top(), min(p.y(), rect.bottom()))
-    return math.hypot(p.x() - x, p.y() - y) <= r
+    def snapshot(self):
+        """建立當前畫面的完整快照（筆畫完成後不再修改，快照直接共用）。"""
+        return {
+            "layers": {n: list(l.strokes) for n, l in self.page.layers.items()},
+            "tool": self.tool,
+            "tool_state": {t: self.tools[t].state() for t in self.tools},
+        }
 
+    def restore(self, snap, base=None):
+        """
+        載入快照內容。有 base（目前這筆紀錄）時只套用 base → snap 之間本機的差異，
+        別人同步過來的筆畫不受本機復原 / 重做影響。
+        """
+        self.active.cancel(self)
+        old = self.strokes
+        for name, items in snap["layers"].items():
+            layer = self.page.layers[name]
+            if base is not None:
+                items = rebase_layer(layer.strokes, base["layers"].get(name, ()), items)
+            layer.set_strokes(list(items))
+
+        for t, state in snap["tool_state"].items():
+            self.tools[t].load(state)
+        self.apply_tool(snap["tool"])
+
+        if self.emit_diff(old, self.strokes):
+            self.scene.bump("strokes")
+        self.page.snapshot_revision = self.scene.revision("strokes")
+        self.update()
 
-class BaseTool:
-    """
-    初步版本：只有屬性，不處理邏輯。
-    不會破壞原本 set_tool / set_size / set_color。
-    """
+    def emit_diff(self, old, new):
+        """復原 / 重做造成的差異也當成本機的變更送出，回傳是否有差異。"""
+        old_ids = {id(s) for s in old}
+        new_ids = {id(s) for s in new}
+        removed = [s for s in old if id(s) not in new_ids]
+        if removed:
+            self.strokes_removed.emit(removed)
+        added = [s for s in new if id(s) not in old_ids]
+        for item in added:
+            self.stroke_added.emit(item)
+        return bool(removed or added)
 
-    name = "base"
-    default_size = 4
-    default_color = "white"
-    shape = "free"
+    def add_history_snapshot(self):
+        """加入新的歷史紀錄；筆畫從上一筆紀錄後沒變過就不加。"""
+        revision = self.scene.revision("strokes")
+        if self.history_index >= 0 and self.page.snapshot_revision == revision:
+            return
+        snap = self.snapshot()
+        snap["serial"] = next(self.serials)
+        self.history.truncate(self.history_index + 1)
+        self.history.append(snap)
+        self.history_index += 1
+        self.page.snapshot_revision = revision
+        self.scene.bump("history")
 
-    def __init__(self):
-        self.size = self.default_size
-        self.color = self.default_color  # 儲存字串
-        self.shape = self.shape
+    # ============================================================
+    #   Strokes
+    # ============================================================
 
-    def get_qcolor(self):
-        if self.color is None:
-            return None
-        rgb = COLOR_TABLE.get(self.color, (255, 255, 255))
-        return QColor(*rgb)
+    @property
+    def active(self):
+        return self.tools[self.tool]
+
+    @property
+    def page(self):
+        return self.pages[self.page_index]
+
+    @property
+    def strokes(self):
+        return self.page.strokes()
+
+    @property
+    def history(self):
+        return self.page.history
+
+    @property
+    def history_index(self):
+        return self.page.history_index
+
+    @history_index.setter
+    def history_index(self, value):
+        self.page.history_index = value
+
+    def layer_for(self, tool):
+        """背景圖層解鎖時畫在背景上，否則螢光筆和筆各自一層。"""
+        if not self.page.layers["background"].locked:
+            return "background"
+        return "highlight" if tool == "highlight" else "pen"
+
+    def add_stroke(self, item):
+        if "layer" not in item:
+            item["layer"] = self.layer_for(item.get("tool"))
+        if "time" not in item:
+            item["time"] = time.time()
+        self.page.layers[item["layer"]].add(item)
+        self.scene.bump("strokes")
+        self.stroke_added.emit(item)
+
+    def import_strokes(self, items):
+        """整批加入匯入的筆畫，只算一筆歷史紀錄。"""
+        if not items:
+            return
+        self.repaint_damage(self.active.cancel(self))
+
+        now = time.time()
+        groups = {name: [] for name in LAYERS}
+        for item in items:
+            if item.get("layer") not in groups:
+                item["layer"] = self.layer_for(item.get("tool"))
+            item.setdefault("time", now)
+            groups[item["layer"]].append(item)
+        for name, group in groups.items():
+            if group:
+                self.page.layers[name].extend(group)
+
+        self.scene.bump("strokes")
+        for item in items:
+            self.stroke_added.emit(item)
+        self.add_history_snapshot()
+        self.update()
 
+    def remove_strokes(self, items):
+        """移除筆畫，回傳需要重繪的範圍。"""
+        damage = QRectF()
+        for name, layer in self.page.layers.items():
+            group = [s for s in items if s.get("layer", "pen") == name]
+            if group:
+                layer.remove(group)
+        self.scene.bump("strokes")
+        self.strokes_removed.emit(items)
+
+        for item in items:
+            damage = damage.united(stroke_bounds(item))
+        return damage
+
+    def stroke_positions(self, items):
+        """每個筆畫在自己圖層裡的位置，之後可以用 insert_strokes 放回原來的順序。"""
+        where = {}
+        for layer in self.page.layers.values():
+            for i, s in enumerate(layer.strokes):
+                where[id(s)] = i
+        return [where.get(id(s), -1) for s in items]
+
+    def insert_strokes(self, items, positions):
+        """把筆畫放回各自圖層的指定位置（-1 表示最上面），回傳需要重繪的範圍。"""
+        damage = QRectF()
+        for pos, item in sorted(zip(positions, items), key=lambda e: e[0]):
+            if "layer" not in item:
+                item["layer"] = self.layer_for(item.get("tool"))
+            layer = self.page.layers[item["layer"]]
+            layer.insert(len(layer.strokes) if pos < 0 else pos, item)
+            damage = damage.united(stroke_bounds(item))
+        self.scene.bump("strokes")
+        for item in items:
+            self.stroke_added.emit(item)
+        return damage
+
+    def query(self, rect):
+        """可編輯（未鎖定）圖層中和 rect 相交的筆畫。"""
+        found = []
+        for layer in self.page.layers.values():
+            if not layer.locked:
+                found += layer.index.query(rect)
+        return found
 
-class PenTool(BaseTool):
-    name = "pen"
-    default_size = 4
-    default_color = "white"
-    shape = "free"
+    # ============================================================
+    #   Remote changes
+    # ============================================================
 
+    def merge_strokes(self, items):
+        """加入別人畫的筆畫：逐筆畫進分塊快取，只重畫它們的範圍。"""
+        known = {s["id"] for s in self.strokes if "id" in s}
+        changed = False
+        for item in items:
+            self.drop_preview(item["id"])
+            if item["id"] in known:
+                continue
+            item["remote"] = True
+            layer = self.page.layers.get(item.get("layer"), self.page.layers["pen"])
+            layer.add(item)
+            self.repaint_damage(stroke_bounds(item))
+            changed = True
+        if changed:
+            self.scene.bump("strokes")
+        return changed
+
+    def drop_strokes(self, ids):
+        ids = set(ids)
+        for key in ids:
+            self.drop_preview(key)
+        found = [s for s in self.strokes if s.get("id") in ids]
+        for name, layer in self.page.layers.items():
+            group = [s for s in found if s.get("layer", "pen") == name]
+            if group:
+                layer.remove(group)
+        for item in found:
+            self.repaint_damage(stroke_bounds(item))
+        if found:
+            self.scene.bump("strokes")
+        return bool(found)
+
+    def clear_layers(self, names):
+        changed = False
+        for name in names:
+            layer = self.page.layers.get(name)
+            if layer is not None and layer.strokes:
+                layer.set_strokes([])
+                changed = True
+        if changed:
+            self.scene.bump("strokes")
+            self.update()
+        return changed
 
-class HighlightTool(BaseTool):
-    name = "highlight"
-    default_size = 12
-    default_color = "yellow"
-    shape = "free"
+    def is_synced(self):
+        """目前的筆畫是不是和最新一筆歷史紀錄一致。"""
+        return self.page.snapshot_revision == self.scene.revision("strokes")
 
+    def keep_synced(self):
+        """別人的變更不進本機的歷史紀錄：目前這筆紀錄仍然當作最新。"""
+        self.page.snapshot_revision = self.scene.revision("strokes")
 
-class EraserTool(BaseTool):
-    name = "eraser"
-    default_size = 30
-    default_color = None
-    shape = "free"
+    def extend_preview(self, key, base, start, points):
+        """別人畫到一半的筆畫收到新的點，只重畫新增的那一段。"""
+        item = self.previews.get(key)
+        if item is None:
+            if start != 0:
+                return
+            item = self.previews[key] = {"type": "pen", "points": [], **base}
+        if start != len(item["points"]):
+            return
+        item["points"].extend(points)
+        pad = item["width"] / 2 + 2
+        self.repaint_damage(points_rect(item["points"][max(0, start - 1) :], pad))
 
+    def drop_preview(self, key):
+        item = self.previews.pop(key, None)
+        if item is not None and item["points"]:
+            self.repaint_damage(points_rect(item["points"], item["width"] / 2 + 2))
 
-class CropEraserTool(BaseTool):
-    name = "crop_eraser"
-    default_size = 40
-    default_color = None
-    shape = "rect"
+    def repaint_damage(self, damage):
+        if damage is not None and not damage.isEmpty():
+            rect = self.view().map_rect(damage)
+            self.update(rect.toAlignedRect().adjusted(-1, -1, 1, 1))
 
+    # ============================================================
+    #   Viewport
+    # ============================================================
 
-class Canva(QWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
+    def board_mode(self):
+        return self.board_color[3] == 255
 
-        self.drawing_mode = True
-        self.board_color = (0, 0, 0, 50)
-        self.setCursor(Qt.CrossCursor)
+    def view(self):
+        """只有不透明黑板可以平移縮放，透明模式要和螢幕對齊。"""
+        return self.viewport if self.board_mode() else IDENTITY
 
-        self.tool = "pen"
-        self.tools = {
-            "pen": {"size": 4, "shape": "free", "color": "white"},
-            "highlight": {"size": 12, "shape": "free", "color": "yellow"},
-            "eraser": {"size": 30, "shape": "free", "color": None},
-            "crop_eraser": {"size": 40, "shape": "rect", "color": None},
-        }
-        self.tool_objects = {
-            "pen": PenTool(),
-            "highlight": HighlightTool(),
-            "eraser": EraserTool(),
-            "crop_eraser": CropEraserTool(),
-        }
+    def scene_pos(self, pos):
+        return self.view().to_scene(pos)
 
-        self.shape = "free"
-        self.thickness = 4
-        self.color = "white"
-        self.pen_color = QColor(255, 255, 255)
-
-        self.start_pos = None
-        self.last_pos = None
-        self.current_stroke = []
+    def set_board_color(self, color):
+        if color == self.board_color:
+            return
+        self.board_color = color
+        self.scene.bump("board")
+        self.update()
 
-        self.strokes = []
-        self.history = []
-        self.history_index = -1
+    def set_template(self, name):
+        if name == self.template:
+            return
+        self.template = name
+        self.scene.bump("board")
+        self.update()
 
-        self.eraser_pos = None
-        self.setMouseTracking(True)
+    def zoom_at(self, pos, factor):
+        self.viewport.zoom_at(pos, factor)
+        self.scene.bump("view")
+        self.update()
 
-        self.size_popup_pos = None
-        self.size_popup_value = None
-        self.size_popup_timer = 0
+    def reset_view(self):
+        if self.viewport.is_identity():
+            return
+        self.viewport.reset()
+        self.scene.bump("view")
+        self.update()
 
-        self.add_history_snapshot()
+    # ============================================================
+    #   Drawing mode
+    # ============================================================
 
-    def snapshot(self):
-        """建立當前畫面的完整快照。"""
-        return {
-            "strokes": [
-                {
-                    "type": s["type"],
-                    "points": s.get("points", []),
-                    "start": s.get("start"),
-                    "end": s.get("end"),
-                    "rect": s.get("rect"),
-                    "color": s["color"],
-                    "width": s["width"],
-                }
-                for s in self.strokes
-            ],
-            "tool": self.tool,
-            "tool_state": {t: self.tools[t].copy() for t in self.tools},
-        }
+    def set_drawing_mode(self, on):
+        """
+        關閉時進入穿透模式：輸入交給底下的視窗，
+        不重繪，只顯示快取好的筆畫圖層。
+        """
+        if on == self.drawing_mode:
+            return
 
-    def restore(self, snap):
-        """載入快照內容。"""
-        self.strokes = [
-            {
-                "type": s["type"],
-                "points": s.get("points", []),
-                "start": s.get("start"),
-                "end": s.get("end"),
-                "rect": s.get("rect"),
-                "color": s["color"],
-                "width": s["width"],
-            }
-            for s in snap["strokes"]
-        ]
-
-        self.tool = snap["tool"]
-        self.tools = {t: snap["tool_state"][t].copy() for t in snap["tool_state"]}
-
-        cfg = self.tools[self.tool]
-        self.shape = cfg["shape"]
-        self.thickness = cfg["size"]
-        if cfg["color"]:
-            r, g, b, a = cfg["color"]
-            self.pen_color = QColor(r, g, b, a)
+        self.drawing_mode = on
+        if not on:
+            self.active.cancel(self)
+            self.pan_pos = None
+            self.setCursor(Qt.ArrowCursor)
+            self.set_board_color((0, 0, 0, 0))
+        else:
+            self.set_board_color((0, 0, 0, 50))
+            self.update_cursor()
 
+        self.drawing_mode_changed.emit(on)
         self.update()
 
-    def add_history_snapshot(self):
-        """加入新的歷史紀錄。"""
-        snap = self.snapshot()
-        self.history = self.history[: self.history_index + 1]
-        self.history.append(snap)
-        self.history_index += 1
-
     # ============================================================
     #   Mouse Events
     # ============================================================
 
     def mousePressEvent(self, event):
         if event.button() == Qt.RightButton:
-            self.drawing_mode = not self.drawing_mode
-
-            if not self.drawing_mode:
-                self.setCursor(Qt.ArrowCursor)
-                self.board_color = (0, 0, 0, 0)
-            else:
-                self.setCursor(Qt.CrossCursor)
-                self.board_color = (0, 0, 0, 50)
-
-            self.update()
+            self.set_drawing_mode(not self.drawing_mode)
             return
 
         if not self.drawing_mode:
             return
 
-        pos = event.pos()
-
         if event.button() == Qt.LeftButton:
-            if self.tool == "eraser":
-                self.erase_at(pos)
+            if self.board_mode() and event.modifiers() & Qt.ControlModifier:
+                self.pan_pos = event.pos()
+                self.setCursor(Qt.ClosedHandCursor)
                 return
 
-            self.start_pos = pos
-            self.last_pos = pos
-            self.current_stroke = [pos]
+            pos = self.scene_pos(event.pos())
+            self.repaint_damage(self.active.press(self, pos))
+            self.drawing.emit(self.active)
 
         if event.button() == Qt.MiddleButton:
             self.window().close()
 
     def mouseMoveEvent(self, event):
-        pos = event.pos()
-        self.eraser_pos = pos
-
         if not self.drawing_mode:
-            self.update()
             return
 
-        if self.tool == "eraser":
-            if event.buttons() & Qt.LeftButton:
-                self.erase_at(pos)
+        if self.pan_pos is not None:
+            self.viewport.pan(event.pos() - self.pan_pos)
+            self.pan_pos = event.pos()
+            self.scene.bump("view")
             self.update()
             return
 
-        if not (event.buttons() & Qt.LeftButton):
-            self.update()
-            return
-
-        if self.shape == "free":
-            self.current_stroke.append(pos)
-        else:
-            self.last_pos = pos
-
-        self.update()
+        if event.buttons() & Qt.LeftButton:
+            pos = self.scene_pos(event.pos())
+            self.repaint_damage(self.active.move(self, pos))
+            self.drawing.emit(self.active)
 
     def mouseReleaseEvent(self, event):
         if not self.drawing_mode or event.button() != Qt.LeftButton:
             return
 
-        if self.tool == "eraser":
+        if self.pan_pos is not None:
+            self.pan_pos = None
+            self.update_cursor()
             return
 
-        # finalize stroke
-        if self.shape == "free" and len(self.current_stroke) > 1:
-            self.strokes.append(
-                {
-                    "type": "pen",
-                    "points": self.current_stroke[:],
-                    "color": self.pen_color,
-                    "width": self.thickness,
-                }
-            )
+        pos = self.scene_pos(event.pos())
+        self.repaint_damage(self.active.release(self, pos))
 
-        elif self.shape == "line":
-            self.strokes.append(
-                {
-                    "type": "line",
-                    "start": self.start_pos,
-                    "end": self.last_pos,
-                    "color": self.pen_color,
-                    "width": self.thickness,
-                }
-            )
-
-        elif self.shape == "rect":
-            rect = QRect(self.start_pos, self.last_pos).normalized()
-            self.strokes.append(
-                {
-                    "type": "rect",
-                    "rect": rect,
-                    "color": self.pen_color,
-                    "width": self.thickness,
-                }
-            )
-
-        self.current_stroke = []
-        self.start_pos = None
-        self.last_pos = None
-
-        self.add_history_snapshot()
-        self.update()
+    def tabletEvent(self, event):
+        """繪圖板只記下壓力，其餘交給 Qt 接著產生的滑鼠事件。"""
+        self.pressure = event.pressure() if event.buttons() else None
+        event.ignore()
 
     def paintEvent(self, event):
         p = QPainter(self)
@@ -296,167 +440,267 @@ class Canva(QWidget):
         # 背景
         self.draw_background(p)
 
-        # 歷史筆畫
-        for item in self.strokes:
-            self.draw_item(p, item)
+        # 歷史筆畫（分塊快取）
+        self.draw_strokes(p, QRectF(event.rect()))
 
-        # 預覽
-        if self.drawing_mode and self.start_pos:
-            preview = None
-
-            if self.shape == "free" and len(self.current_stroke):
-                preview = {
-                    "type": "pen",
-                    "points": self.current_stroke,
-                    "color": self.pen_color,
-                    "width": self.thickness,
-                }
-
-            elif self.shape == "line":
-                preview = {
-                    "type": "line",
-                    "start": self.start_pos,
-                    "end": self.last_pos,
-                    "color": self.pen_color,
-                    "width": self.thickness,
-                }
+        # 別人畫到一半的筆畫
+        if self.previews:
+            p.setTransform(self.view().transform())
+            for item in self.previews.values():
+                draw_item(p, item)
+            p.resetTransform()
 
-            elif self.shape == "rect":
-                rect = QRect(self.start_pos, self.last_pos).normalized()
-                preview = {
-                    "type": "rect",
-                    "rect": rect,
-                    "color": self.pen_color,
-                    "width": self.thickness,
-                }
-
-            if preview:
-                self.draw_item(p, preview)
-
-        # 橡皮擦圈
-        if self.tool == "eraser" and self.eraser_pos:
-            pen = QPen(QColor(255, 120, 0))
-            pen.setWidth(2)
-            p.setPen(pen)
-            p.setBrush(Qt.NoBrush)
-            r = self.thickness / 2
-            p.drawEllipse(self.eraser_pos, r, r)
-
-        # popup
-        if self.size_popup_value is not None:
-            pen = QPen(QColor(255, 200, 80))
-            pen.setWidth(2)
-            p.setPen(pen)
-            r = self.size_popup_value / 2
-            p.drawEllipse(self.size_popup_pos, r, r)
-            p.drawText(
-                self.size_popup_pos + QPoint(20, -20), f"{self.size_popup_value}px"
-            )
+        # 穿透模式：只顯示快取的筆畫
+        if not self.drawing_mode:
+            return
 
-            self.size_popup_timer -= 1
-            if self.size_popup_timer <= 0:
-                self.size_popup_value = None
-                self.size_popup_pos = None
+        # 預覽
+        p.setTransform(self.view().transform())
+        self.active.draw_preview(self, p)
+        p.resetTransform()
 
         # 邊框
-        if self.drawing_mode:
-            pen = QPen(QColor(255, 120, 0))
-            pen.setWidth(2)
-            p.setPen(pen)
-            p.drawRect(self.rect())
+        p.setPen(palette.pen(palette.ACCENT, 2))
+        p.setBrush(Qt.NoBrush)
+        p.drawRect(self.rect())
+
+    def render_image(self, background=None):
+        """背景 + 各圖層的分塊快取畫成一張 QImage（不含預覽與邊框）。"""
+        dpr = self.devicePixelRatioF()
+        img = QImage(
+            round(self.width() * dpr),
+            round(self.height() * dpr),
+            QImage.Format_ARGB32_Premultiplied,
+        )
+        img.setDevicePixelRatio(dpr)
+        img.fill(Qt.transparent)
+
+        p = QPainter(img)
+        if background:
+            self.draw_board(p, QColor(*background), dpr)
+        self.draw_strokes(p, QRectF(self.rect()))
+        p.end()
+        return img
 
     def draw_background(self, painter):
-        r, g, b, a = self.board_color
-        painter.fillRect(self.rect(), QColor(r, g, b, a))
-
-    def draw_item(self, painter, item):
-        pen = QPen(item["color"])
-        pen.setWidth(item["width"])
-        pen.setCapStyle(Qt.RoundCap)
-        painter.setPen(pen)
+        self.draw_board(painter, QColor(*self.board_color), self.devicePixelRatioF())
 
-        t = item["type"]
-
-        if t == "pen":
-            pts = item["points"]
-            for i in range(1, len(pts)):
-                painter.drawLine(pts[i - 1], pts[i])
+    def draw_board(self, painter, color, dpr):
+        """不透明的黑板鋪上快取好的底紋，半透明的遮罩只填顏色。"""
+        rect = QRectF(self.rect())
+        if color.alpha() == 255:
+            draw_template(painter, rect, self.template, color, self.view(), dpr)
+        else:
+            painter.fillRect(rect, color)
+
+    def draw_strokes(self, painter, rect):
+        """從各圖層的分塊快取貼上 rect（畫面座標）內的筆畫。"""
+        view = self.view()
+        dpr = self.devicePixelRatioF()
+
+        painter.translate(view.offset)
+        for name in LAYERS:
+            store = self.page.layers[name].store
+            store.sync(view.scale, dpr)
+            store.paint(painter, rect.translated(-view.offset))
+        painter.resetTransform()
+
+    def draw_items(self, painter, items, scale):
+        """畫一組筆畫，縮小時用簡化過的點並略過太小的筆畫。"""
+        lod = lod_tolerance(scale)
+        tiny = 0.5 / scale
+        for item in items:
+            if lod is not None:
+                bbox = stroke_bounds(item)
+                if bbox.width() < tiny and bbox.height() < tiny:
+                    continue
+            draw_item(painter, item, lod)
 
-        elif t == "line":
-            painter.drawLine(item["start"], item["end"])
+    def show_size_popup(self, pos, value):
+        self.size_popup.show_at(pos, value)
 
-        elif t == "rect":
-            painter.drawRect(item["rect"])
+    def scene_changed(self, aspect):
+        if aspect in CURSOR_ASPECTS:
+            self.update_cursor()
 
-    def show_size_popup(self, pos, value):
-        self.size_popup_pos = pos
-        self.size_popup_value = value
-        self.size_popup_timer = 10
-        self.update()
+    def update_cursor(self):
+        """游標上畫著筆刷大小或橡皮擦的圈，跟著工具、粗細、顏色與縮放更新。"""
+        if not self.drawing_mode or self.pan_pos is not None:
+            return
+        cursor = cursors.tool_cursor(
+            self.active,
+            self.thickness,
+            self.pen_color if self.active.color is not None else None,
+            self.devicePixelRatioF(),
+            self.view().scale,
+        )
+        self.setCursor(cursor)
 
     def last_tool(self):
         pass
 
     def set_tool(self, tool):
-        self.tool = tool
-        cfg = self.tools[tool]
-
-        self.shape = cfg["shape"]
-
-        self.thickness = cfg["size"]
-
-        if cfg["color"] is None:
-            self.setCursor(Qt.BlankCursor)
-        else:
-            r, g, b, a = cfg["color"]
-            self.pen_color = QColor(r, g, b, a)
-            self.setCursor(Qt.CrossCursor)
-
+        self.repaint_damage(self.active.cancel(self))
+        self.apply_tool(tool)
         self.update()
 
+    def apply_tool(self, tool):
+        """換成 tool 並載入它的粗細、形狀與顏色，只通知真的變了的部分。"""
+        t = self.tools[tool]
+        changed = []
+        if tool != self.tool:
+            self.tool = tool
+            changed.append("tool")
+        if t.shape != self.shape:
+            self.shape = t.shape
+            changed.append("shape")
+        if t.size != self.thickness:
+            self.thickness = t.size
+            changed.append("size")
+
+        if t.color is not None:
+            pen_color = palette.qcolor(t.color)
+            if t.color != self.color or pen_color != self.pen_color:
+                self.color = t.color
+                self.pen_color = pen_color
+                changed.append("color")
+
+        for aspect in changed:
+            self.scene.bump(aspect)
+
     def set_size(self, size):
+        if size == self.thickness:
+            return
         self.thickness = size
-        self.tools[self.tool]["size"] = size
+        self.active.size = size
+        self.scene.bump("size")
 
     def set_shape(self, shape):
+        if shape == self.shape:
+            return
         self.shape = shape
-        self.tools[self.tool]["shape"] = shape
+        self.active.shape = shape
+        self.scene.bump("shape")
+
+    def toggle_smoothing(self):
+        self.smoothing = not self.smoothing
+
+    def toggle_variable_width(self):
+        self.variable_width = not self.variable_width
+
+    def toggle_recognize(self):
+        self.recognize = not self.recognize
 
     def set_color(self, color):
-        self.color = color
-        if color == "white":
-            rgb = (255, 255, 255)
-        elif color == "red":
-            rgb = (248, 49, 47)
-        elif color == "orange":
-            rgb = (255, 103, 35)
-        elif color == "yellow":
-            rgb = (255, 176, 46)
-        elif color == "green":
-            rgb = (0, 210, 106)
-        elif color == "blue":
-            rgb = (0, 166, 237)
-        elif color == "purple":
-            rgb = (199, 144, 241)
-        else:
+        if color not in palette.COLORS:
             print("Error: Invalid color")
+            return
 
-        r, g, b = rgb
-        self.pen_color = QColor(r, g, b)
-        self.tools[self.tool]["color"] = (r, g, b, 255)
-        self.update()
+        # 選取工具拿新顏色去換選取的筆畫
+        self.repaint_damage(self.active.recolor(self, color))
+        if color == self.color:
+            return
+        self.color = color
+        self.pen_color = palette.qcolor(color)
+        self.active.color = color
+        self.scene.bump("color")
 
     def undo(self):
-        if self.history_index > 0:
-            self.history_index -= 1
-            self.restore(self.history[self.history_index])
+        self.jump_to(self.history_index - 1)
 
     def redo(self):
-        if self.history_index < len(self.history) - 1:
-            self.history_index += 1
-            self.restore(self.history[self.history_index])
+        self.jump_to(self.history_index + 1)
+
+    def jump_to(self, index):
+        """
+        直接跳到任一筆歷史紀錄。每筆都是完整快照（共用筆畫物件），
+        不用一步一步重播，跳多遠都只需要比對與目前畫面的差異。
+        """
+        if index == self.history_index or not 0 <= index < len(self.history):
+            return
+        base = self.history[self.history_index] if self.history_index >= 0 else None
+        self.history_index = index
+        self.restore(self.history[index], base)
+        self.scene.bump("history")
 
     def clear(self):
-        self.strokes = []
+        """清空未鎖定的圖層；本來就是空的就什麼都不做，也不加歷史紀錄。"""
+        names = [n for n, layer in self.page.layers.items() if not layer.locked]
+        if not self.clear_layers(names):
+            return
+        self.cleared.emit(names)
+        self.add_history_snapshot()
+
+    # ============================================================
+    #   Pages / Layers
+    # ============================================================
+
+    def make_page(self):
+        return Page(self.draw_items, self.history_budget)
+
+    def switch_page(self, index):
+        """換頁只是換掉目前的頁面與它的快取，不需要重畫其他頁。"""
+        self.repaint_damage(self.active.cancel(self))
+        self.page_index = index % len(self.pages)
+
+        self.page_clock += 1
+        self.page.last_used = self.page_clock
+        self.page.load()
+        self.spill_pages()
+        self.scene.bump("page")
         self.update()
+
+    def next_page(self):
+        self.switch_page(self.page_index + 1)
+
+    def prev_page(self):
+        self.switch_page(self.page_index - 1)
+
+    def new_page(self):
+        self.pages.insert(self.page_index + 1, self.make_page())
+        self.switch_page(self.page_index + 1)
         self.add_history_snapshot()
+
+    def spill_pages(self):
+        """超過記憶體預算時，把最久沒用的頁面寫到磁碟。"""
+        total = sum(page.memory() for page in self.pages)
+        others = [page for page in self.pages if page is not self.page]
+        others.sort(key=lambda page: page.last_used)
+
+        for page in others:
+            if total <= self.page_budget:
+                break
+            if page.spill_path is not None:
+                continue
+
+            if self.spill_dir is None:
+                self.spill_dir = tempfile.TemporaryDirectory(prefix="screen-pen-")
+            total -= page.memory()
+            page.spill(self.spill_dir.name, f"page-{id(page)}.bin")
+
+    def toggle_background_lock(self):
+        layer = self.page.layers["background"]
+        layer.locked = not layer.locked
+
+    def session_data(self):
+        """所有頁面的筆畫，可以存成 session 檔。"""
+        pages = []
+        for page in self.pages:
+            page.load()
+            pages.append(
+                {
+                    "layers": {
+                        name: [encode_stroke(s) for s in layer.strokes]
+                        for name, layer in page.layers.items()
+                    },
+                    "locked": {n: l.locked for n, l in page.layers.items()},
+                }
+            )
+        self.spill_pages()
+
+        return {
+            "version": VERSION,
+            "size": [self.width(), self.height()],
+            "board_color": list(self.board_color),
+            "pages": pages,
+        }
@@ -0,0 +1,592 @@
+# type: ignore
+"""
+區網共用白板：一個 asyncio 伺服器保存筆畫，多個畫面連上來同步。
+
+python collab.py --port 48620          # 單獨啟動伺服器
+python main.py --serve                 # 啟動伺服器並加入
+python main.py --join 192.168.0.5      # 加入別人的伺服器
+"""
+from PySide2.QtCore import QObject, QRectF, QTimer
+from PySide2.QtNetwork import QAbstractSocket, QTcpSocket
+from array import array
+from collections import OrderedDict
+import argparse
+import asyncio
+import struct
+import sys
+import threading
+import zlib
+
+from session import flat_points, unflat_points
+from tools import DrawTool
+import palette
+
+DEFAULT_PORT = 48620
+
+# 訊息：1 byte 種類 + 4 bytes 長度 + 內容
+HELLO, ADD, ERASE, CLEAR, SNAPSHOT, POINTS = range(1, 7)
+FRAME = struct.Struct("<BI")
+COUNT = struct.Struct("<I")
+STROKE_ID = struct.Struct("<II")
+STROKE_HEAD = struct.Struct("<II4BfdB")  # id、顏色、粗細、時間、旗標
+POINTS_HEAD = struct.Struct("<II4BfI")  # id、顏色、粗細、從第幾個點開始
+SMOOTH, WIDTHS = 1, 2
+
+MAX_PENDING = 20000  # 連線中排隊的項目上限，超過就斷線重連、整份重新同步
+RECONNECT_MIN = 500  # ms
+RECONNECT_MAX = 8000  # ms
+
+
+# ============================================================
+#   Binary encoding
+# ============================================================
+
+
+def pack_text(text):
+    data = text.encode()
+    return bytes([len(data)]) + data
+
+
+def unpack_text(data, pos):
+    n = data[pos]
+    return data[pos + 1 : pos + 1 + n].decode(), pos + 1 + n
+
+
+def pack_stroke(item):
+    """筆畫 → bytes。座標用 float32，一個點 8 bytes。"""
+    c = item["color"]
+    cid, n = item["id"]
+    out = [
+        STROKE_HEAD.pack(
+            cid,
+            n,
+            c.red(),
+            c.green(),
+            c.blue(),
+            c.alpha(),
+            item["width"],
+            item.get("time", 0),
+            (SMOOTH if item.get("smooth") else 0) | (WIDTHS if "widths" in item else 0),
+        ),
+        pack_text(item["type"]),
+        pack_text(item.get("tool", "pen")),
+        pack_text(item.get("layer", "pen")),
+    ]
+
+    t = item["type"]
+    if t == "pen":
+        values = flat_points(item["points"])
+    elif t in ("line", "arrow"):
+        values = flat_points([item["start"], item["end"]])
+    else:
+        r = QRectF(item["rect"])
+        values = [r.x(), r.y(), r.width(), r.height()]
+
+    out.append(COUNT.pack(len(values)))
+    out.append(array("f", values).tobytes())
+    if "widths" in item:
+        out.append(array("f", item["widths"]).tobytes())
+    return b"".join(out)
+
+
+def unpack_stroke(data):
+    cid, n, r, g, b, a, width, stamp, flags = STROKE_HEAD.unpack_from(data)
+    pos = STROKE_HEAD.size
+    t, pos = unpack_text(data, pos)
+    tool, pos = unpack_text(data, pos)
+    layer, pos = unpack_text(data, pos)
+    (count,) = COUNT.unpack_from(data, pos)
+    pos += COUNT.size
+    values = array("f", data[pos : pos + count * 4]).tolist()
+    pos += count * 4
+
+    item = {
+        "id": (cid, n),
+        "type": t,
+        "tool": tool,
+        "layer": layer,
+        "color": palette.rgba_color(r, g, b, a),
+        "width": width,
+        "time": stamp,
+    }
+    if flags & SMOOTH:
+        item["smooth"] = True
+    if flags & WIDTHS:
+        item["widths"] = array("f", data[pos : pos + count * 2]).tolist()
+    if t == "pen":
+        item["points"] = unflat_points(values)
+    elif t in ("line", "arrow"):
+        item["start"], item["end"] = unflat_points(values)
+    else:
+        item["rect"] = QRectF(*values)
+    return item
+
+
+def pack_points(key, tool, color, width, start, points):
+    """畫到一半的筆畫：這一幀新增的點。"""
+    head = POINTS_HEAD.pack(
+        *key,
+        color.red(),
+        color.green(),
+        color.blue(),
+        color.alpha(),
+        width,
+        start,
+    )
+    values = flat_points(points)
+    return b"".join(
+        [head, pack_text(tool), COUNT.pack(len(values)), array("f", values).tobytes()]
+    )
+
+
+def unpack_points(data):
+    cid, n, r, g, b, a, width, start = POINTS_HEAD.unpack_from(data)
+    tool, pos = unpack_text(data, POINTS_HEAD.size)
+    (count,) = COUNT.unpack_from(data, pos)
+    pos += COUNT.size
+    values = array("f", data[pos : pos + count * 4]).tolist()
+    base = {"color": palette.rgba_color(r, g, b, a), "width": width, "tool": tool}
+    return (cid, n), base, start, unflat_points(values)
+
+
+def stroke_layer(data):
+    """不解碼整筆，只讀出圖層名稱。"""
+    pos = STROKE_HEAD.size
+    for _ in range(2):
+        pos += 1 + data[pos]
+    return unpack_text(data, pos)[0]
+
+
+def pack_names(names):
+    return bytes([len(names)]) + b"".join(pack_text(n) for n in names)
+
+
+def unpack_names(data):
+    names, pos = [], 1
+    for _ in range(data[0]):
+        name, pos = unpack_text(data, pos)
+        names.append(name)
+    return names
+
+
+def pack_blobs(blobs):
+    """多筆資料接在一起：總數 + 每筆的長度與內容。"""
+    out = [COUNT.pack(len(blobs))]
+    for blob in blobs:
+        out.append(COUNT.pack(len(blob)))
+        out.append(blob)
+    return b"".join(out)
+
+
+def unpack_blobs(data):
+    (count,) = COUNT.unpack_from(data)
+    pos = COUNT.size
+    blobs = []
+    for _ in range(count):
+        (n,) = COUNT.unpack_from(data, pos)
+        pos += COUNT.size
+        blobs.append(bytes(data[pos : pos + n]))
+        pos += n
+    return blobs
+
+
+def pack_ids(ids):
+    return COUNT.pack(len(ids)) + b"".join(STROKE_ID.pack(*i) for i in ids)
+
+
+def unpack_ids(data):
+    (count,) = COUNT.unpack_from(data)
+    return [
+        STROKE_ID.unpack_from(data, COUNT.size + i * STROKE_ID.size)
+        for i in range(count)
+    ]
+
+
+def frame(kind, payload=b""):
+    return FRAME.pack(kind, len(payload)) + payload
+
+
+def read_frames(buffer):
+    """從 bytearray 取出完整的訊息，沒收完的留在 buffer 裡。"""
+    pos = 0
+    while len(buffer) - pos >= FRAME.size:
+        kind, n = FRAME.unpack_from(buffer, pos)
+        if len(buffer) - pos - FRAME.size < n:
+            break
+        start = pos + FRAME.size
+        yield kind, bytes(buffer[start : start + n])
+        pos = start + n
+    del buffer[:pos]
+
+
+# ============================================================
+#   Server
+# ============================================================
+
+
+class Server:
+    """保存目前的筆畫（原始 bytes，不解碼），把變更轉送給其他人。"""
+
+    def __init__(self):
+        self.strokes = OrderedDict()  # id bytes -> (圖層, 筆畫 bytes)
+        self.clients = {}  # writer -> client id
+        self.next_client = 1
+
+    async def handle(self, reader, writer):
+        cid = self.next_client
+        self.next_client += 1
+        self.clients[writer] = cid
+
+        # 新加入的人拿到一份壓縮過的完整內容
+        blobs = [blob for _, blob in self.strokes.values()]
+        snapshot = zlib.compress(pack_blobs(blobs))
+        writer.write(frame(HELLO, COUNT.pack(cid)) + frame(SNAPSHOT, snapshot))
+
+        buffer = bytearray()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                buffer += data
+                out = [
+                    self.apply(kind, payload) for kind, payload in read_frames(buffer)
+                ]
+                out = b"".join(f for f in out if f)
+                if out:
+                    self.broadcast(out, writer)
+        except ConnectionError:
+            pass
+        finally:
+            del self.clients[writer]
+            writer.close()
+
+    def apply(self, kind, payload):
+        if kind == ADD:
+            for blob in unpack_blobs(payload):
+                self.strokes[blob[: STROKE_ID.size]] = (stroke_layer(blob), blob)
+        elif kind == ERASE:
+            for i in unpack_ids(payload):
+                self.strokes.pop(STROKE_ID.pack(*i), None)
+        elif kind == CLEAR:
+            names = set(unpack_names(payload))
+            for key, (layer, _) in list(self.strokes.items()):
+                if layer in names:
+                    del self.strokes[key]
+        elif kind != POINTS:
+            # 畫到一半的點只轉送，不保存
+            return None
+        return frame(kind, payload)
+
+    def broadcast(self, data, sender):
+        for writer in self.clients:
+            if writer is not sender:
+                writer.write(data)
+
+    async def serve(self, host, port, ready=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+
+def start_server_thread(host="0.0.0.0", port=DEFAULT_PORT):
+    """在背景執行緒跑伺服器，回傳時已經可以連線。"""
+    ready = threading.Event()
+    thread = threading.Thread(
+        target=lambda: asyncio.run(Server().serve(host, port, ready)), daemon=True
+    )
+    thread.start()
+    ready.wait(2)
+    return thread
+
+
+# ============================================================
+#   Client
+# ============================================================
+
+
+class CollabClient(QObject):
+    """
+    把 Canva 接到伺服器。本機的變更先排隊，每一幀（16ms）合併成一次送出，
+    畫到一半的筆畫也每一幀送出新增的點；收到的筆畫直接加進圖層的分塊快取，
+    只重畫它們的範圍，而且不進本機的復原紀錄。
+
+    斷線時不保留要新增的筆畫（重連後整份重送），只記下擦掉的 id 與清空的圖層；
+    連線後會自動重連，等待時間逐次加倍。
+    """
+
+    def __init__(self, canva, host="127.0.0.1", port=DEFAULT_PORT):
+        super().__init__(canva)
+        self.canva = canva
+        self.host = host
+        self.port = port
+        self.client_id = None
+        self.counter = 0
+        self.pending = []  # [(種類, [項目])]，只在連線中使用
+        self.pending_count = 0
+        self.erased = set()  # 斷線時擦掉的筆畫 id
+        self.cleared = set()  # 斷線時清空的圖層
+        self.buffer = bytearray()
+
+        self.live = None  # 正在畫的那一筆的點（DrawTool.points）
+        self.live_tool = None
+        self.live_id = None
+        self.live_sent = 0  # 已經送出的點數
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(16)
+        self.flush_timer.timeout.connect(self.flush)
+
+        self.retry = RECONNECT_MIN
+        self.aborting = False  # 自己斷的線（重新同步）不用排重連
+        self.reconnect_timer = QTimer(self)
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.timeout.connect(self.connect)
+
+        canva.stroke_added.connect(lambda item: self.queue(ADD, [item]))
+        canva.strokes_removed.connect(lambda items: self.queue(ERASE, items))
+        canva.cleared.connect(lambda names: self.queue(CLEAR, names))
+        canva.drawing.connect(self.track)
+
+        self.sock = QTcpSocket(self)
+        self.sock.readyRead.connect(self.read)
+        self.sock.disconnected.connect(self.lost)
+        self.sock.errorOccurred.connect(self.failed)
+        self.connect()
+
+    # ============================================================
+    #   Connection
+    # ============================================================
+
+    def connect(self):
+        self.buffer.clear()
+        # abort 會立刻發出 disconnected，不能讓 lost 再排一次重連
+        self.aborting = True
+        self.sock.abort()
+        self.aborting = False
+        self.sock.connectToHost(self.host, self.port)
+
+    @property
+    def online(self):
+        return (
+            self.client_id is not None
+            and self.sock.state() == QAbstractSocket.ConnectedState
+        )
+
+    def failed(self, error):
+        if error != QAbstractSocket.RemoteHostClosedError:
+            print(f"Warning: collab connection: {self.sock.errorString()}")
+        self.lost()
+
+    def lost(self):
+        """斷線：排隊中的變更改成只記 id，稍後重連。"""
+        if self.aborting or self.reconnect_timer.isActive():
+            return
+        self.go_offline()
+        self.reconnect_timer.start(self.retry)
+        self.retry = min(self.retry * 2, RECONNECT_MAX)
+
+    def go_offline(self):
+        self.client_id = None
+        for kind, items in self.pending:
+            self.remember(kind, items)
+        self.pending = []
+        self.pending_count = 0
+        self.live = None
+        self.live_id = None
+        self.live_sent = 0
+
+    def remember(self, kind, items):
+        # 新增的筆畫不用記，重連後會整份重送
+        if kind == ERASE:
+            self.erased.update(s["id"] for s in items if "id" in s)
+        elif kind == CLEAR:
+            self.cleared.update(items)
+
+    # ============================================================
+    #   Sending
+    # ============================================================
+
+    def queue(self, kind, items):
+        if kind == ADD and self.live_id is not None:
+            # 收筆：沿用畫的過程中送出的 id，別人那邊直接換成完成的筆畫
+            for item in items:
+                if "id" not in item and item.get("tool") == self.live_tool:
+                    item["id"] = self.live_id
+                    self.live = None
+                    self.live_id = None
+                    self.live_sent = 0
+
+        if not self.online:
+            self.remember(kind, items)
+            return
+
+        if self.pending and self.pending[-1][0] == kind:
+            self.pending[-1][1].extend(items)
+        else:
+            self.pending.append((kind, list(items)))
+        self.pending_count += len(items)
+
+        if self.pending_count > MAX_PENDING:
+            # 送不出去的太多了：丟掉排隊的內容，重連後整份重新同步
+            self.go_offline()
+            self.reconnect_timer.stop()
+            self.connect()
+            return
+
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def track(self, tool):
+        """本機畫到一半：下一幀把新增的點送出去。只有自由筆會一邊畫一邊送。"""
+        if not isinstance(tool, DrawTool) or self.canva.shape != "free":
+            return
+        if tool.points is not self.live:
+            # 新的一筆（press 會換一個新的 list）
+            self.end_live()
+            self.live = tool.points
+            self.live_tool = tool.name
+        if self.online and not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def end_live(self):
+        """沒有收筆就結束（取消）時，通知別人拿掉預覽。"""
+        if self.live_id is not None and self.online:
+            self.pending.append((ERASE, [{"id": self.live_id}]))
+        self.live = None
+        self.live_id = None
+        self.live_sent = 0
+
+    def live_points(self):
+        """這一幀要送出的點；收筆或取消後 tool.points 會換掉，這一筆就結束。"""
+        points = self.live
+        tool = self.canva.active
+        if points is None:
+            return None
+        if getattr(tool, "points", None) is not points:
+            self.end_live()
+            return None
+        if len(points) <= self.live_sent:
+            return None
+
+        if self.live_id is None:
+            self.live_id = self.next_id()
+        start = self.live_sent
+        self.live_sent = len(points)
+        return pack_points(
+            self.live_id,
+            self.live_tool,
+            self.canva.pen_color,
+            self.canva.thickness,
+            start,
+            points[start:],
+        )
+
+    def next_id(self):
+        self.counter += 1
+        return (self.client_id, self.counter)
+
+    def stroke_id(self, item):
+        if "id" not in item:
+            item["id"] = self.next_id()
+        return item["id"]
+
+    def flush(self):
+        if not self.online:
+            return
+
+        out = []
+        points = self.live_points()
+        if points is not None:
+            out.append(frame(POINTS, points))
+
+        for kind, items in self.pending:
+            if kind == ADD:
+                for item in items:
+                    self.stroke_id(item)
+                out.append(frame(ADD, pack_blobs([pack_stroke(s) for s in items])))
+            elif kind == ERASE:
+                ids = [s["id"] for s in items if "id" in s]
+                out.append(frame(ERASE, pack_ids(ids)))
+            else:
+                out.append(frame(CLEAR, pack_names(items)))
+        self.pending = []
+        self.pending_count = 0
+        if out:
+            self.sock.write(b"".join(out))
+
+        # 還在畫就下一幀繼續送
+        if self.live is not None:
+            self.flush_timer.start()
+
+    # ============================================================
+    #   Receiving
+    # ============================================================
+
+    def hello(self, payload):
+        """（重新）連上：送出斷線期間的清空與擦除，再送出目前所有的筆畫。"""
+        (self.client_id,) = COUNT.unpack(payload)
+        self.retry = RECONNECT_MIN
+        self.pending = []
+        if self.cleared:
+            self.pending.append((CLEAR, sorted(self.cleared)))
+        if self.erased:
+            self.pending.append((ERASE, [{"id": i} for i in self.erased]))
+        self.pending.append((ADD, self.canva.strokes))
+        self.pending_count = 0
+
+    def read(self):
+        self.buffer += bytes(self.sock.readAll())
+
+        synced = self.canva.is_synced()
+        changed = False
+        for kind, payload in read_frames(self.buffer):
+            if kind == HELLO:
+                self.hello(payload)
+            elif kind == SNAPSHOT:
+                blobs = unpack_blobs(zlib.decompress(payload))
+                items = [unpack_stroke(b) for b in blobs]
+                # 斷線期間本機擦掉或清空的，不要被伺服器的舊內容加回來
+                items = [
+                    s
+                    for s in items
+                    if s["id"] not in self.erased and s.get("layer") not in self.cleared
+                ]
+                self.erased.clear()
+                self.cleared.clear()
+                changed |= self.canva.merge_strokes(items)
+                self.flush()
+            elif kind == ADD:
+                blobs = unpack_blobs(payload)
+                changed |= self.canva.merge_strokes([unpack_stroke(b) for b in blobs])
+            elif kind == ERASE:
+                changed |= self.canva.drop_strokes(unpack_ids(payload))
+            elif kind == CLEAR:
+                changed |= self.canva.clear_layers(unpack_names(payload))
+            elif kind == POINTS:
+                self.canva.extend_preview(*unpack_points(payload))
+
+        # 別人的變更不加進本機的復原紀錄
+        if changed and synced:
+            self.canva.keep_synced()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared board server.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    print(f"Serving on {args.host}:{args.port}")
+    try:
+        asyncio.run(Server().serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
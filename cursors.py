@@ -0,0 +1,94 @@
+# type: ignore
+"""
+游標層：橡皮擦的圈、筆刷大小都畫在游標圖上，由系統移動，
+滑鼠移過畫布時不用重畫。調整大小的提示是一個小的子視窗。
+"""
+from PySide2.QtCore import Qt, QPoint, QPointF, QTimer
+from PySide2.QtGui import QCursor, QPainter, QPixmap
+from PySide2.QtWidgets import QWidget
+
+import palette
+
+MAX_CURSOR = 256  # 游標圖最大邊長（裝置無關像素）
+POPUP_TIME = 600  # ms
+
+_cursors = {}
+
+
+def tool_cursor(tool, size, color, dpr=1.0, scale=1.0):
+    """依工具、畫面上的粗細與顏色產生游標，同樣的組合只畫一次。"""
+    if tool.name not in ("pen", "highlight", "laser", "eraser"):
+        return QCursor(tool.cursor)
+
+    d = min(MAX_CURSOR - 4, max(2, round(size * scale)))
+    key = (tool.name, d, color.rgba() if color is not None else None, dpr)
+    cursor = _cursors.get(key)
+    if cursor is None:
+        cursor = _cursors[key] = _make_cursor(tool.name, d, color, dpr)
+    return cursor
+
+
+def _make_cursor(name, d, color, dpr):
+    side = max(d + 4, 16)
+    pm = QPixmap(round(side * dpr), round(side * dpr))
+    pm.setDevicePixelRatio(dpr)
+    pm.fill(Qt.transparent)
+
+    p = QPainter(pm)
+    p.setRenderHint(QPainter.Antialiasing)
+    center = QPointF(side / 2, side / 2)
+    r = d / 2
+
+    if name == "eraser":
+        p.setPen(palette.pen(palette.ACCENT, 2))
+        p.drawEllipse(center, r, r)
+    else:
+        # 筆刷大小的圓點，外面一圈深色邊讓亮色背景上也看得到
+        p.setPen(palette.pen(palette.rgba_color(0, 0, 0, 160), 1))
+        p.setBrush(color)
+        p.drawEllipse(center, r, r)
+        if d < 8:
+            # 太小的筆刷加上十字，才找得到游標
+            p.setPen(palette.pen(palette.rgba_color(255, 255, 255, 200), 1))
+            p.drawLine(
+                QPointF(center.x() - 6, center.y()), QPointF(center.x() + 6, center.y())
+            )
+            p.drawLine(
+                QPointF(center.x(), center.y() - 6), QPointF(center.x(), center.y() + 6)
+            )
+    p.end()
+
+    return QCursor(pm, side // 2, side // 2)
+
+
+class SizePopup(QWidget):
+    """滾輪調整大小時的提示：只重畫自己這一小塊，時間到自動隱藏。"""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.value = 0
+        self.hide()
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(POPUP_TIME)
+        self.timer.timeout.connect(self.hide)
+
+    def show_at(self, pos, value):
+        self.value = value
+        r = value // 2
+        self.setGeometry(pos.x() - r - 2, pos.y() - r - 40, r + 90, r * 2 + 44)
+        self.show()
+        self.update()
+        self.timer.start()
+
+    def paintEvent(self, event):
+        p = QPainter(self)
+        p.setRenderHint(QPainter.Antialiasing)
+        p.setPen(palette.pen(palette.POPUP, 2))
+
+        r = self.value / 2
+        center = QPointF(r + 2, r + 40)
+        p.drawEllipse(center, r, r)
+        p.drawText(center.toPoint() + QPoint(20, -20), f"{self.value}px")
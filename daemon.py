@@ -0,0 +1,71 @@
+# type: ignore
+from PySide2.QtCore import QCoreApplication, QObject
+from PySide2.QtNetwork import QLocalServer, QLocalSocket
+
+SERVER_NAME = "desktop-screen-pen"
+COMMANDS = ["show", "hide", "toggle", "draw", "quit"]
+
+
+def connect(timeout=300):
+    """連到常駐中的程式，沒有人回應時回傳 None。"""
+    sock = QLocalSocket()
+    sock.connectToServer(SERVER_NAME)
+    if not sock.waitForConnected(timeout):
+        return None
+    return sock
+
+
+def send_command(command, timeout=300):
+    """把指令送給常駐中的程式，沒有常駐程式時回傳 False。"""
+    sock = connect(timeout)
+    if sock is None:
+        return False
+
+    sock.write(command.encode() + b"\n")
+    sock.waitForBytesWritten(timeout)
+    sock.disconnectFromServer()
+    return True
+
+
+class Daemon(QObject):
+    """
+    常駐模式：視窗關閉時只隱藏，筆畫、快取與歷史都留在記憶體。
+    其他行程透過 QLocalServer 傳 show / hide / toggle / draw / quit 控制。
+    """
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.handlers = {
+            "show": window.show_overlay,
+            "hide": window.hide_overlay,
+            "toggle": window.toggle_overlay,
+            "draw": window.toggle_drawing,
+            "quit": QCoreApplication.instance().quit,
+        }
+
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.accept)
+        if not self.server.listen(SERVER_NAME):
+            sock = connect()
+            if sock is not None:
+                # 已經有另一個常駐程式在用，不能搶走它的 socket
+                sock.disconnectFromServer()
+                print("Warning: another instance is already running")
+                return
+            # 沒有人回應：上一次異常結束留下的 socket 檔
+            QLocalServer.removeServer(SERVER_NAME)
+            self.server.listen(SERVER_NAME)
+
+    def accept(self):
+        while self.server.hasPendingConnections():
+            sock = self.server.nextPendingConnection()
+            sock.readyRead.connect(lambda s=sock: self.read(s))
+            sock.disconnected.connect(sock.deleteLater)
+
+    def read(self, sock):
+        while sock.canReadLine():
+            command = bytes(sock.readLine()).decode().strip()
+            handler = self.handlers.get(command)
+            if handler is not None:
+                handler()
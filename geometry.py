@@ -0,0 +1,136 @@
+# type: ignore
+from PySide2.QtCore import QRectF
+import math
+
+
+def dist(a, b):
+    return math.hypot(a.x() - b.x(), a.y() - b.y())
+
+
+def line_hit(p, a, b, r):
+    return segment_dist(p, a, b) <= r
+
+
+def points_rect(points, pad=0):
+    xs = [p.x() for p in points]
+    ys = [p.y() for p in points]
+    left, top = min(xs) - pad, min(ys) - pad
+    return QRectF(left, top, max(xs) + pad - left, max(ys) + pad - top)
+
+
+def around(p, r):
+    return QRectF(p.x() - r, p.y() - r, r * 2, r * 2)
+
+
+def simplify(points, tolerance):
+    """Ramer–Douglas–Peucker 簡化折線，保留頭尾。"""
+    return [p for p, k in zip(points, simplify_mask(points, tolerance)) if k]
+
+
+def simplify_mask(points, tolerance):
+    """同 simplify，但回傳每個點要不要留（方便一起篩掉對應的粗細）。"""
+    if len(points) < 3:
+        return [True] * len(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        a, b = points[first], points[last]
+        far, far_i = tolerance, None
+
+        for i in range(first + 1, last):
+            d = segment_dist(points[i], a, b)
+            if d > far:
+                far, far_i = d, i
+
+        if far_i is not None:
+            keep[far_i] = True
+            stack.append((first, far_i))
+            stack.append((far_i, last))
+
+    return keep
+
+
+def segment_dist(p, a, b):
+    abx, aby = b.x() - a.x(), b.y() - a.y()
+    ab_len = abx * abx + aby * aby
+    if ab_len == 0:
+        return dist(p, a)
+
+    t = max(0, min(1, ((p.x() - a.x()) * abx + (p.y() - a.y()) * aby) / ab_len))
+    return math.hypot(p.x() - a.x() - t * abx, p.y() - a.y() - t * aby)
+
+
+class SpatialIndex:
+    """均勻格子索引，用筆畫外框查詢附近的筆畫。"""
+
+    def __init__(self, cell=128):
+        self.cell = cell
+        self.cells = {}
+        self.items = {}
+        self.order = 0
+
+    def _span(self, rect):
+        c = self.cell
+        x0, x1 = int(rect.left() // c), int(rect.right() // c)
+        y0, y1 = int(rect.top() // c), int(rect.bottom() // c)
+        return x0, x1, y0, y1
+
+    def _keys(self, rect):
+        x0, x1, y0, y1 = self._span(rect)
+        return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+    def insert(self, item, rect, order=None):
+        """order 是繪製順序，沒給時排在最上面。"""
+        keys = self._keys(rect)
+        if order is None:
+            self.order += 1
+            order = self.order
+        self.items[id(item)] = (item, keys, rect, order)
+        for k in keys:
+            self.cells.setdefault(k, []).append(item)
+
+    def order_of(self, item):
+        return self.items[id(item)][3]
+
+    def replace(self, old, new, rect):
+        """換成新的物件，保留原本的繪製順序。"""
+        entry = self.items.get(id(old))
+        self.remove(old)
+        self.insert(new, rect, entry[3] if entry else None)
+
+    def remove(self, item):
+        entry = self.items.pop(id(item), None)
+        if entry is None:
+            return
+
+        for k in entry[1]:
+            bucket = self.cells[k]
+            bucket[:] = [s for s in bucket if s is not item]
+            if not bucket:
+                del self.cells[k]
+
+    def clear(self):
+        self.cells = {}
+        self.items = {}
+        self.order = 0
+
+    def query(self, rect, ordered=False):
+        """查詢和 rect 相交的筆畫；ordered=True 時依加入順序（繪製順序）回傳。"""
+        x0, x1, y0, y1 = self._span(rect)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.items):
+            # 範圍比筆畫數還大（例如縮得很小），直接掃過全部
+            found = [e for e in self.items.values() if e[2].intersects(rect)]
+        else:
+            seen = {}
+            for k in self._keys(rect):
+                for item in self.cells.get(k, ()):
+                    seen[id(item)] = self.items[id(item)]
+            found = [e for e in seen.values() if e[2].intersects(rect)]
+
+        if ordered:
+            found.sort(key=lambda e: e[3])
+        return [e[0] for e in found]
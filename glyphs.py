@@ -0,0 +1,78 @@
+# type: ignore
+from PySide2.QtCore import Qt, QPointF
+from PySide2.QtGui import QColor, QFont, QIcon, QPainter, QPen, QPixmap
+import os
+
+BUTTON_SIZE = 52
+
+_icons = {}
+_glyphs = {}
+_font = None
+
+
+def get_icon(path: str):
+    icon = _icons.get(path)
+    if icon is None:
+        base = os.path.dirname(os.path.abspath(__file__))
+        full = os.path.join(base, "image", "toolbar", path)
+        icon = _icons[path] = QIcon(full)
+    return icon
+
+
+def glyph_font():
+    global _font
+    if _font is None:
+        _font = QFont("Microsoft JhengHei")
+        _font.setPointSize(24)
+    return _font
+
+
+def _cached(key, dpr, paint):
+    """依狀態與 DPR 快取按鈕圖示，重繪時只需要貼圖。"""
+    pix = _glyphs.get((key, dpr))
+    if pix is None:
+        pix = QPixmap(int(BUTTON_SIZE * dpr), int(BUTTON_SIZE * dpr))
+        pix.setDevicePixelRatio(dpr)
+        pix.fill(Qt.transparent)
+
+        p = QPainter(pix)
+        p.setRenderHint(QPainter.Antialiasing)
+        p.setPen(QPen(QColor(255, 255, 255), 3))
+        paint(p, BUTTON_SIZE // 2, BUTTON_SIZE // 2)
+        p.end()
+
+        _glyphs[(key, dpr)] = pix
+    return pix
+
+
+def size_glyph(thickness, dpr=1.0):
+    r = min(18, thickness / 2)
+
+    def paint(p, cx, cy):
+        p.setBrush(Qt.NoBrush)
+        p.drawEllipse(QPointF(cx, cy), r, r)
+
+    return _cached(("size", r), dpr, paint)
+
+
+def shape_glyph(shape, dpr=1.0):
+    def paint(p, cx, cy):
+        if shape == "free":
+            p.setFont(glyph_font())
+            p.drawText(0, 0, BUTTON_SIZE, BUTTON_SIZE, Qt.AlignCenter, "S")
+
+        elif shape == "line":
+            p.drawLine(cx - 12, cy - 12, cx + 12, cy + 12)
+
+        elif shape == "rect":
+            p.drawRect(cx - 12, cy - 12, 24, 24)
+
+    return _cached(("shape", shape), dpr, paint)
+
+
+def color_glyph(rgb, dpr=1.0):
+    def paint(p, cx, cy):
+        p.setBrush(QColor(*rgb))
+        p.drawRoundedRect(cx - 13, cy - 13, 26, 26, 8, 8)
+
+    return _cached(("color", rgb), dpr, paint)
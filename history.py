@@ -0,0 +1,249 @@
+# type: ignore
+from PySide2.QtGui import QColor
+from collections import OrderedDict
+import hashlib
+import pickle
+import tempfile
+import threading
+
+from session import decode_stroke, encode_stroke
+from strokes import CACHED
+
+POINT_BYTES = 72
+STROKE_BYTES = 200
+REF_BYTES = 8  # 快照 list 裡的一個參照
+
+
+def stroke_cost(item):
+    return STROKE_BYTES + len(item.get("points", ())) * POINT_BYTES
+
+
+def snapshot_items(snap):
+    for items in snap["layers"].values():
+        yield from items
+
+
+class History:
+    """
+    復原紀錄。記憶體超過 budget 時，最舊的快照寫進暫存檔（只會往後寫的 log），
+    需要時再讀回來。內容相同的筆畫在 log 裡只存一次。
+
+    快照裡的筆畫和圖層共用同一個物件，只有已經不在圖層上的筆畫才算快照自己的記憶體；
+    live() 回傳目前圖層上的筆畫。讀回磁碟上的快照時，還在圖層上的筆畫直接用原本的物件。
+    """
+
+    def __init__(self, budget=64 * 1024 * 1024, cache=20000, live=tuple):
+        self.budget = budget
+        self.live = live
+        self.entries = []  # 快照 dict，或寫到磁碟後的 (offset, length)
+        self.costs = []  # 快照本身 list 的大小
+        self.serials = []  # 每筆快照的編號，不用讀回磁碟上的快照就能認出是哪一筆
+        self.memory = 0
+        self.refs = {}  # id -> [筆畫, 記憶體中有幾筆快照用到]
+
+        self.log = None
+        self.lock = threading.RLock()  # 縮圖執行緒也會讀 log
+        self.stroke_refs = {}  # digest -> (offset, length)
+        self.loaded = OrderedDict()  # digest -> 讀回來的筆畫（LRU）
+        self.cache = cache
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, i):
+        entry = self.entries[i]
+        if isinstance(entry, dict):
+            return entry
+        return self._read_snapshot(entry)
+
+    def append(self, snap):
+        cost = REF_BYTES * sum(len(items) for items in snap["layers"].values())
+        self.entries.append(snap)
+        self.costs.append(cost)
+        self.serials.append(snap.get("serial"))
+        self.memory += cost
+        self._hold(snap, 1)
+        self.enforce()
+
+    def truncate(self, n):
+        for i in range(n, len(self.entries)):
+            self._drop(i)
+        del self.entries[n:]
+        del self.costs[n:]
+        del self.serials[n:]
+
+    def remove(self, i):
+        self._drop(i)
+        del self.entries[i]
+        del self.costs[i]
+        del self.serials[i]
+
+    def _hold(self, snap, k):
+        """記憶體中的快照增減一次對每個筆畫的參照。"""
+        refs = self.refs
+        for item in snapshot_items(snap):
+            entry = refs.get(id(item))
+            if entry is None:
+                entry = refs[id(item)] = [item, 0]
+            entry[1] += k
+            if entry[1] <= 0:
+                del refs[id(item)]
+
+    def _drop(self, i):
+        snap = self.entries[i]
+        if isinstance(snap, dict):
+            self.memory -= self.costs[i]
+            self._hold(snap, -1)
+
+    def usage(self):
+        """快照 list 本身，加上只剩快照留著（已經不在圖層上）的筆畫。"""
+        live = {id(s) for s in self.live()}
+        owned = sum(
+            stroke_cost(item) for key, (item, _) in self.refs.items() if key not in live
+        )
+        return self.memory + owned
+
+    def enforce(self):
+        """從最舊的開始寫到磁碟，最新一筆一定留在記憶體。"""
+        usage = self.usage()
+        for i in range(len(self.entries) - 1):
+            if usage <= self.budget:
+                break
+            if isinstance(self.entries[i], dict):
+                self.spill(i)
+                usage = self.usage()
+
+    def spill_all(self):
+        for i in range(len(self.entries)):
+            self.spill(i)
+
+    def substituted(self, mapping):
+        """
+        generator：算出記憶體中的快照把筆畫換成 mapping 裡的新物件後的樣子，
+        每算一筆 yield 一次，不修改原本的快照；最後回傳 {位置: 新快照}，交給 replace。
+        """
+        out = {}
+        for i, snap in enumerate(self.entries):
+            if isinstance(snap, dict) and any(
+                id(s) in mapping for s in snapshot_items(snap)
+            ):
+                layers = {
+                    name: [mapping.get(id(s), s) for s in items]
+                    for name, items in snap["layers"].items()
+                }
+                out[i] = {**snap, "layers": layers}
+            yield
+        return out
+
+    def replace(self, snaps):
+        for i, snap in snaps.items():
+            self._hold(self.entries[i], -1)
+            self.entries[i] = snap
+            self._hold(snap, 1)
+
+    def detached(self, i):
+        """
+        給背景執行緒畫圖用的第 i 筆快照：回傳一個函式，在背景呼叫時才讀磁碟。
+        拿到的筆畫都是新的 dict（不帶快取），不會動到圖層上的筆畫與共用的快取。
+        """
+        entry = self.entries[i]
+        if isinstance(entry, dict):
+            layers = {
+                name: [{k: v for k, v in s.items() if k not in CACHED} for s in items]
+                for name, items in entry["layers"].items()
+            }
+            return lambda: layers
+        return lambda: self._read_detached(entry)
+
+    def _read_detached(self, ref):
+        with self.lock:
+            record = pickle.loads(self._read(ref))
+            data = {
+                name: [pickle.loads(self._read(self.stroke_refs[d])) for d in digests]
+                for name, digests in record["layers"].items()
+            }
+        return {
+            name: [decode_stroke(d, QColor) for d in items]
+            for name, items in data.items()
+        }
+
+    def serial(self, i):
+        return self.serials[i]
+
+    def in_memory(self, i):
+        return isinstance(self.entries[i], dict)
+
+    # ============================================================
+    #   Disk log
+    # ============================================================
+
+    def _write(self, data):
+        with self.lock:
+            if self.log is None:
+                self.log = tempfile.TemporaryFile(prefix="screen-pen-history-")
+            self.log.seek(0, 2)
+            offset = self.log.tell()
+            self.log.write(data)
+            return offset, len(data)
+
+    def _read(self, ref):
+        offset, length = ref
+        with self.lock:
+            self.log.seek(offset)
+            return self.log.read(length)
+
+    def spill(self, i):
+        snap = self.entries[i]
+        if not isinstance(snap, dict):
+            return
+
+        layers = {}
+        for name, items in snap["layers"].items():
+            digests = []
+            for item in items:
+                # 寫過的筆畫會記住 digest，之後的快照不用再編碼、雜湊一次
+                digest = item.get("digest")
+                if digest not in self.stroke_refs:
+                    data = encode_stroke(item)
+                    if item.get("remote"):
+                        data["remote"] = True
+                    data = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+                    digest = hashlib.blake2b(data, digest_size=16).digest()
+                    item["digest"] = digest
+                    if digest not in self.stroke_refs:
+                        self.stroke_refs[digest] = self._write(data)
+                digests.append(digest)
+            layers[name] = digests
+
+        record = {**snap, "layers": layers}
+        self._drop(i)
+        self.entries[i] = self._write(pickle.dumps(record, pickle.HIGHEST_PROTOCOL))
+
+    def _stroke(self, digest, live):
+        item = live.get(digest)
+        if item is not None:
+            return item
+
+        item = self.loaded.get(digest)
+        if item is None:
+            data = pickle.loads(self._read(self.stroke_refs[digest]))
+            item = decode_stroke(data)
+            item["digest"] = digest
+            if data.get("remote"):
+                item["remote"] = True
+            self.loaded[digest] = item
+            if len(self.loaded) > self.cache:
+                self.loaded.popitem(last=False)
+        else:
+            self.loaded.move_to_end(digest)
+        return item
+
+    def _read_snapshot(self, ref):
+        record = pickle.loads(self._read(ref))
+        # 還在圖層上的筆畫用同一個物件，比對差異時才不會整頁都算改過
+        live = {s["digest"]: s for s in self.live() if "digest" in s}
+        layers = {
+            name: [self._stroke(d, live) for d in digests]
+            for name, digests in record["layers"].items()
+        }
+        return {**record, "layers": layers}
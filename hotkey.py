@@ -0,0 +1,73 @@
+# type: ignore
+from PySide2.QtCore import QObject, Qt, QTimer, Signal
+from PySide2.QtGui import QGuiApplication
+
+try:
+    from pynput import keyboard
+except ImportError:
+    keyboard = None
+
+DEFAULT_HOTKEY = "<ctrl>+<alt>+d"
+HOLD_MODIFIERS = Qt.ControlModifier | Qt.AltModifier | Qt.ShiftModifier
+HOLD_TIME = 500  # ms
+POLL_INTERVAL = 100  # ms
+
+
+class GlobalHotkey(QObject):
+    """
+    系統層級快速鍵（需要 pynput）。
+    穿透模式下視窗收不到鍵盤，用它回到繪圖模式；沒有安裝 pynput 時不做事。
+    """
+
+    activated = Signal()
+
+    def __init__(self, combo=DEFAULT_HOTKEY, parent=None):
+        super().__init__(parent)
+        self.listener = None
+
+        if keyboard is None:
+            return
+
+        # pynput 在自己的執行緒呼叫，Signal 會排回 GUI 執行緒
+        self.listener = keyboard.GlobalHotKeys({combo: self.activated.emit})
+        self.listener.daemon = True
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+class ModifierHotkey(QObject):
+    """
+    不需要額外套件的備用快速鍵：按住 Ctrl + Alt + Shift 半秒。
+    穿透模式下視窗收不到按鍵，改用計時器向系統查詢修飾鍵的狀態，只在穿透模式時輪詢。
+    """
+
+    activated = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.held = 0
+        self.timer = QTimer(self)
+        self.timer.setInterval(POLL_INTERVAL)
+        self.timer.timeout.connect(self.poll)
+
+    def start(self):
+        self.held = 0
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def poll(self):
+        mods = QGuiApplication.queryKeyboardModifiers()
+        if mods & HOLD_MODIFIERS != HOLD_MODIFIERS:
+            self.held = 0
+            return
+
+        self.held += POLL_INTERVAL
+        if self.held >= HOLD_TIME:
+            self.held = 0
+            self.activated.emit()
@@ -0,0 +1,263 @@
+# type: ignore
+from PySide2.QtCore import QObject, QRectF, QTimer
+from PySide2.QtWidgets import QApplication
+import time
+
+from geometry import SpatialIndex, simplify_mask
+from strokes import CACHED, stroke_bounds
+
+IDLE_DELAY = 1500  # ms，停手多久後開始整理
+SLICE = 0.008  # 每次事件迴圈最多做幾秒
+SIMPLIFY_TOLERANCE = 0.25  # px，肉眼看不出的誤差
+MIN_AGE = 5  # 秒，剛畫完的筆畫先不動
+
+
+class IdleScheduler(QObject):
+    """
+    使用者停手時，在背景分段整理筆畫、索引、歷史與快取。
+    每段只做幾毫秒就把控制權還給事件迴圈；一有輸入立刻停下，等下次停手再從頭來。
+    每個工作都是 generator，yield 的地方資料都是完整的，隨時可以中斷。
+    「輸入」是畫布上的繪圖動作與畫布狀態的變化（快速鍵也會改到狀態），不用攔截整個程式的事件。
+    """
+
+    def __init__(self, canva, parent=None):
+        super().__init__(parent)
+        self.canva = canva
+        self.jobs = []
+        self.key = None
+        self.clean = None  # 上次整理完時的版本號，沒變就不用再整理
+        self.young = False
+        self.busy = False  # 自己的工作造成的狀態變化不算輸入
+
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(IDLE_DELAY)
+        self.idle_timer.timeout.connect(self.start)
+
+        self.work_timer = QTimer(self)
+        self.work_timer.setInterval(0)
+        self.work_timer.timeout.connect(self.step)
+
+        canva.drawing.connect(self.touch)
+        canva.scene.changed.connect(self.touch)
+        self.idle_timer.start()
+
+    def touch(self, *args):
+        if self.busy:
+            return
+        self.cancel()
+        self.idle_timer.start()
+
+    def cancel(self):
+        self.jobs = []
+        self.work_timer.stop()
+
+    def start(self):
+        if QApplication.mouseButtons():
+            self.idle_timer.start()
+            return
+
+        page = self.canva.page
+        scene = self.canva.scene
+        self.key = (
+            id(page),
+            scene.revision("strokes"),
+            scene.revision("page"),
+            scene.revision("view"),
+        )
+        if self.key == self.clean:
+            return
+
+        self.young = False
+        self.jobs = [
+            self.simplify_strokes(page),
+            self.remove_duplicates(page),
+            self.rebuild_indexes(page),
+            self.compact_history(page),
+            self.trim_tiles(),
+        ]
+        self.work_timer.start()
+
+    def step(self):
+        deadline = time.perf_counter() + SLICE
+        while self.jobs:
+            self.busy = True
+            try:
+                next(self.jobs[0])
+            except StopIteration:
+                self.jobs.pop(0)
+            finally:
+                self.busy = False
+            if time.perf_counter() > deadline:
+                return
+
+        self.work_timer.stop()
+        self.canva.spill_pages()
+        if not self.young:
+            self.clean = self.key
+
+    # ============================================================
+    #   Jobs
+    # ============================================================
+
+    def simplify_strokes(self, page):
+        """
+        舊的自由筆畫：去掉多餘的點，改存成 tuple（不留 list 的預留空間）。
+        完成的筆畫不能改，做出新的筆畫物件，最後和歷史紀錄裡的快照一起換上。
+        """
+        now = time.time()
+        selected = {id(s) for s in getattr(self.canva.active, "selection", ())}
+        mapping = {}
+        for layer in page.layers.values():
+            for item in list(layer.strokes):
+                if item.get("packed") or item["type"] != "pen":
+                    continue
+                # 平滑筆畫的曲線是由這些點算出來的，少了點形狀就會變
+                if item.get("smooth") or id(item) in selected:
+                    continue
+                if now - item.get("time", 0) < MIN_AGE:
+                    self.young = True
+                    continue
+
+                mapping[id(item)] = simplified(item)
+                yield
+
+        if not mapping:
+            return
+        snaps = yield from page.history.substituted(mapping)
+        # 圖層和快照在同一段裡一起換，中途不會有一半新一半舊
+        for layer in page.layers.values():
+            layer.replace(mapping)
+        page.history.replace(snaps)
+
+    def remove_duplicates(self, page):
+        """
+        完全重疊的不透明筆畫只留最上面那筆（例如重複匯入或同步）。
+        半透明的筆畫重疊會變深，不能合併。
+        只在最新一筆歷史紀錄上整理，直接併進這一筆：不會砍掉重做紀錄，也不多一步復原。
+        """
+        canva = self.canva
+        if not self.at_tip(page):
+            return
+
+        duplicates = []
+        for layer in page.layers.values():
+            seen = {}
+            for item in reversed(layer.strokes):
+                if item["color"].alpha() != 255:
+                    continue
+                key = stroke_key(item)
+                if key in seen:
+                    duplicates.append(item)
+                else:
+                    seen[key] = item
+                yield
+
+        if not duplicates or not self.at_tip(page):
+            return
+        # 和擦掉一樣經過 Canva，才會通知同步
+        canva.repaint_damage(canva.remove_strokes(duplicates))
+        removed = {id(s) for s in duplicates}
+        i = page.history_index
+        snap = page.history[i]
+        layers = {
+            name: [s for s in items if id(s) not in removed]
+            for name, items in snap["layers"].items()
+        }
+        page.history.replace({i: {**snap, "layers": layers}})
+        canva.keep_synced()
+
+    def at_tip(self, page):
+        """目前的頁面停在最新一筆歷史紀錄，而且畫面和它一致。"""
+        canva = self.canva
+        return (
+            page is canva.page
+            and page.history_index == len(page.history) - 1
+            and page.history.in_memory(page.history_index)
+            and canva.is_synced()
+        )
+
+    def rebuild_indexes(self, page):
+        """依繪製順序重建空間索引；分段建在新的索引上，整層建好才換上。"""
+        for layer in page.layers.values():
+            strokes = layer.strokes
+            count = len(strokes)
+            index = SpatialIndex(layer.index.cell)
+            for item in strokes[:count]:
+                index.insert(item, stroke_bounds(item))
+                yield
+            # 建的途中圖層變了（例如收到同步）就放棄這一層
+            if layer.strokes is strokes and len(strokes) == count:
+                layer.index = index
+            yield
+
+    def compact_history(self, page):
+        """連續兩筆內容一樣的歷史紀錄（例如清空空白頁）只留一筆。"""
+        history = page.history
+        i = len(history) - 1
+        while i > 0:
+            if (
+                history.in_memory(i)
+                and history.in_memory(i - 1)
+                and same_snapshot(history[i], history[i - 1])
+            ):
+                history.remove(i)
+                if page.history_index >= i:
+                    page.history_index -= 1
+                self.canva.scene.bump("history")
+            i -= 1
+            yield
+
+    def trim_tiles(self):
+        """只留畫面附近的分塊，其他頁的分塊全部丟掉。"""
+        canva = self.canva
+        view = canva.view()
+        for page in canva.pages:
+            for layer in page.layers.values():
+                if page is canva.page:
+                    store = layer.store
+                    keep = QRectF(canva.rect()).translated(-view.offset)
+                    keep.adjust(-store.tile, -store.tile, store.tile, store.tile)
+                    store.trim(keep)
+                else:
+                    layer.store.trim()
+                yield
+
+
+def simplified(item):
+    """
+    去掉多餘的點後的新筆畫；和 transform_stroke 一樣不帶快取。
+    digest 要留著：已經寫到歷史 log 的快照靠它認出圖層上換過的筆畫。
+    """
+    keep = simplify_mask(item["points"], SIMPLIFY_TOLERANCE)
+    new = {k: v for k, v in item.items() if k not in CACHED or k == "digest"}
+    new["points"] = tuple(p for p, k in zip(item["points"], keep) if k)
+    if "widths" in item:
+        new["widths"] = tuple(w for w, k in zip(item["widths"], keep) if k)
+    new["packed"] = True
+    return new
+
+
+def stroke_key(item):
+    c = item["color"]
+    t = item["type"]
+    if t == "pen":
+        shape = tuple((p.x(), p.y()) for p in item["points"])
+    elif t in ("line", "arrow"):
+        shape = (item["start"].x(), item["start"].y(), item["end"].x(), item["end"].y())
+    else:
+        r = item["rect"]
+        shape = (r.x(), r.y(), r.width(), r.height())
+    return (t, c.rgba(), item["width"], tuple(item.get("widths", ())), shape)
+
+
+def same_snapshot(a, b):
+    if a["tool"] != b["tool"] or a["tool_state"] != b["tool_state"]:
+        return False
+    for name, items in a["layers"].items():
+        other = b["layers"].get(name, ())
+        if len(items) != len(other):
+            return False
+        if any(x is not y for x, y in zip(items, other)):
+            return False
+    return True
@@ -0,0 +1,421 @@
+# type: ignore
+"""
+匯入事先準備好的標註（SVG 或 JSON）當成筆畫。
+解析在背景執行緒做，做完整批交給 Canva，只算一筆歷史紀錄。
+
+SVG：path / polyline / polygon / line / rect / circle / ellipse，
+支援 g 的 transform 與 stroke 樣式繼承；座標直接當成畫面像素（不處理 viewBox）。
+JSON：session 檔、{"strokes": [...]} 或筆畫 list，筆畫格式同 session。
+"""
+from PySide2.QtCore import QObject, QPointF, QRectF, Signal
+from PySide2.QtGui import QColor
+from itertools import accumulate
+import json
+import math
+import re
+import threading
+import xml.etree.ElementTree as ET
+
+from session import decode_stroke
+from strokes import stroke_bounds
+import palette
+
+CURVE_STEPS = 8  # 每段曲線切成幾段直線
+ELLIPSE_STEPS = 64  # 旋轉過的橢圓切成幾段
+DEFAULT_WIDTH = 4
+
+SHAPES = {"path", "polyline", "polygon", "line", "rect", "circle", "ellipse"}
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+PATH_SEGMENT = re.compile(r"([MmLlHhVvCcSsQqTtAaZz])([^MmLlHhVvCcSsQqTtAaZz]*)")
+NUMBER = re.compile(r"[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?")
+TRANSFORM = re.compile(r"(matrix|translate|scale|rotate)\s*\(([^)]*)\)")
+
+
+class Importer(QObject):
+    """在背景執行緒讀檔與解析，完成後由 loaded 把筆畫送回 GUI 執行緒。"""
+
+    loaded = Signal(object)  # [筆畫]
+    failed = Signal(str)
+
+    def start(self, path):
+        thread = threading.Thread(target=self.run, args=(path,), daemon=True)
+        thread.start()
+
+    def run(self, path):
+        # 格式有問題的檔案可能丟出任何例外，全部回報，不讓執行緒默默結束
+        try:
+            items = load_strokes(path)
+        except Exception as e:
+            self.failed.emit(f"{path}: {e}")
+            return
+        self.loaded.emit(items)
+
+
+def load_strokes(path):
+    if path.lower().endswith(".svg"):
+        items = svg_strokes(path)
+    else:
+        with open(path, encoding="utf-8") as f:
+            items = json_strokes(json.load(f))
+
+    for item in items:
+        stroke_bounds(item)
+    return items
+
+
+# ============================================================
+#   JSON
+# ============================================================
+
+
+def json_strokes(data):
+    if isinstance(data, dict) and "pages" in data:
+        records = [
+            d
+            for page in data["pages"]
+            for items in page["layers"].values()
+            for d in items
+        ]
+    elif isinstance(data, dict):
+        records = data["strokes"]
+    else:
+        records = data
+    return [json_stroke(d) for d in records]
+
+
+def json_stroke(data):
+    """補上預設值後交給 session 的格式解碼；顏色可以是名稱，點可以是 [x, y] 對。"""
+    data = dict(data)
+    data.setdefault("type", "pen")
+    data.setdefault("width", DEFAULT_WIDTH)
+
+    color = data.get("color", "white")
+    if isinstance(color, str):
+        c = named_color(color) if color in palette.COLORS else parse_color(color)
+        c = c or named_color("white")
+        color = [c.red(), c.green(), c.blue(), c.alpha()]
+    data["color"] = color
+
+    points = data.get("points")
+    if points and isinstance(points[0], (list, tuple)):
+        data["points"] = [v for p in points for v in p]
+
+    item = decode_stroke(data, QColor)
+    if "layer" not in data:
+        # 沒指定圖層的話依工具決定
+        del item["layer"]
+    return item
+
+
+# ============================================================
+#   SVG
+# ============================================================
+
+
+def svg_strokes(path):
+    """用 iterparse 一個元素一個元素讀，處理完就清掉，大檔案也不會整棵樹留在記憶體。"""
+    items = []
+    stack = [({"stroke": None, "fill": None, "width": 1.0, "opacity": 1.0}, IDENTITY)]
+
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "end":
+            stack.pop()
+            elem.clear()
+            continue
+
+        style, matrix = stack[-1]
+        style = element_style(elem, style)
+        if "transform" in elem.attrib:
+            matrix = multiply(matrix, parse_transform(elem.attrib["transform"]))
+        stack.append((style, matrix))
+
+        tag = elem.tag.rpartition("}")[2]
+        if tag in SHAPES:
+            items += shape_strokes(tag, elem.attrib, style, matrix)
+
+    return items
+
+
+def element_style(elem, parent):
+    style = dict(parent)
+    attrs = dict(elem.attrib)
+    for part in attrs.pop("style", "").split(";"):
+        key, _, value = part.partition(":")
+        if value:
+            attrs[key.strip()] = value.strip()
+
+    if "stroke" in attrs:
+        style["stroke"] = attrs["stroke"]
+    if "fill" in attrs:
+        style["fill"] = attrs["fill"]
+    if "stroke-width" in attrs:
+        style["width"] = parse_length(attrs["stroke-width"], style["width"])
+    for key in ("opacity", "stroke-opacity"):
+        if key in attrs:
+            style["opacity"] *= parse_length(attrs[key], 1.0)
+    return style
+
+
+def shape_strokes(tag, attrs, style, matrix):
+    paint = style["stroke"]
+    if paint in (None, "none"):
+        paint = style["fill"]
+    if paint == "none":
+        return []
+    color = parse_color(paint or "white") or named_color("white")
+    alpha = round(color.alpha() * max(0.0, min(1.0, style["opacity"])))
+
+    a, b, c, d = matrix[:4]
+    base = {
+        "color": QColor(color.red(), color.green(), color.blue(), alpha),
+        "width": max(1.0, style["width"] * math.sqrt(abs(a * d - b * c))),
+        "tool": "pen",
+    }
+    axis_aligned = b == 0 and c == 0
+
+    def num(key):
+        return parse_length(attrs.get(key, "0"), 0.0)
+
+    if tag == "line":
+        start = apply(matrix, num("x1"), num("y1"))
+        end = apply(matrix, num("x2"), num("y2"))
+        return [{"type": "line", "start": start, "end": end, **base}]
+
+    if tag == "rect":
+        x, y, w, h = num("x"), num("y"), num("width"), num("height")
+        if axis_aligned:
+            rect = QRectF(apply(matrix, x, y), apply(matrix, x + w, y + h))
+            return [{"type": "rect", "rect": rect.normalized(), **base}]
+        corners = [(x, y), (x + w, y), (x + w, y + h), (x, y + h), (x, y)]
+        return [pen_stroke(corners, matrix, base)]
+
+    if tag in ("circle", "ellipse"):
+        cx, cy = num("cx"), num("cy")
+        if tag == "circle":
+            rx = ry = num("r")
+        else:
+            rx, ry = num("rx"), num("ry")
+        if axis_aligned:
+            rect = QRectF(
+                apply(matrix, cx - rx, cy - ry), apply(matrix, cx + rx, cy + ry)
+            )
+            return [{"type": "ellipse", "rect": rect.normalized(), **base}]
+        ring = []
+        for i in range(ELLIPSE_STEPS + 1):
+            t = 2 * math.pi * i / ELLIPSE_STEPS
+            ring.append((cx + rx * math.cos(t), cy + ry * math.sin(t)))
+        return [pen_stroke(ring, matrix, base)]
+
+    if tag in ("polyline", "polygon"):
+        values = [float(v) for v in NUMBER.findall(attrs.get("points", ""))]
+        pts = list(zip(values[0::2], values[1::2]))
+        if tag == "polygon" and pts:
+            pts.append(pts[0])
+        return [pen_stroke(pts, matrix, base)] if pts else []
+
+    return [pen_stroke(pts, matrix, base) for pts in parse_path(attrs.get("d", ""))]
+
+
+def pen_stroke(pts, matrix, base):
+    return {"type": "pen", "points": transform_points(matrix, pts), **base}
+
+
+def parse_path(d):
+    """SVG path → 子路徑的點（曲線切成直線段，弧線只取終點）。"""
+    paths = []
+    pts = []
+    x = y = sx = sy = 0.0
+    ctrl = None  # 上一段曲線的控制點，給 S / T 用
+
+    # 連續同樣的指令（例如一長串 L）合併成一段，一次轉換所有數字
+    segments = []
+    for cmd, args in PATH_SEGMENT.findall(d):
+        if segments and cmd == segments[-1][0] and cmd not in "MmZz":
+            segments[-1][1].append(args)
+        else:
+            segments.append((cmd, [args]))
+
+    for cmd, args in segments:
+        v = list(map(float, NUMBER.findall(" ".join(args))))
+        op = cmd.upper()
+        rel = cmd != op
+
+        if op == "Z":
+            if pts:
+                pts.append((sx, sy))
+            x, y = sx, sy
+            ctrl = None
+            continue
+
+        if op in "ML":
+            # 一次處理整串座標；相對座標用累加
+            xs, ys = v[0::2], v[1::2]
+            n = min(len(xs), len(ys))
+            if n == 0:
+                continue
+            xs, ys = xs[:n], ys[:n]
+            if rel:
+                xs = list(accumulate(xs, initial=x))[1:]
+                ys = list(accumulate(ys, initial=y))[1:]
+            if op == "M":
+                if pts:
+                    paths.append(pts)
+                pts = []
+                sx, sy = xs[0], ys[0]
+            pts.extend(zip(xs, ys))
+            x, y = xs[-1], ys[-1]
+            ctrl = None
+
+        elif op == "H":
+            for value in v:
+                x = x + value if rel else value
+                pts.append((x, y))
+            ctrl = None
+
+        elif op == "V":
+            for value in v:
+                y = y + value if rel else value
+                pts.append((x, y))
+            ctrl = None
+
+        elif op in "CS":
+            n = 6 if op == "C" else 4
+            for k in range(0, len(v) - n + 1, n):
+                ox, oy = (x, y) if rel else (0.0, 0.0)
+                if op == "C":
+                    x1, y1, x2, y2, ex, ey = v[k : k + 6]
+                    c1 = (ox + x1, oy + y1)
+                else:
+                    x2, y2, ex, ey = v[k : k + 4]
+                    c1 = (2 * x - ctrl[0], 2 * y - ctrl[1]) if ctrl else (x, y)
+                c2 = (ox + x2, oy + y2)
+                end = (ox + ex, oy + ey)
+                pts += cubic((x, y), c1, c2, end)
+                ctrl = c2
+                x, y = end
+
+        elif op in "QT":
+            n = 4 if op == "Q" else 2
+            for k in range(0, len(v) - n + 1, n):
+                ox, oy = (x, y) if rel else (0.0, 0.0)
+                if op == "Q":
+                    x1, y1, ex, ey = v[k : k + 4]
+                    c1 = (ox + x1, oy + y1)
+                else:
+                    ex, ey = v[k : k + 2]
+                    c1 = (2 * x - ctrl[0], 2 * y - ctrl[1]) if ctrl else (x, y)
+                end = (ox + ex, oy + ey)
+                pts += quadratic((x, y), c1, end)
+                ctrl = c1
+                x, y = end
+
+        else:  # A
+            for k in range(0, len(v) - 6, 7):
+                ox, oy = (x, y) if rel else (0.0, 0.0)
+                x, y = ox + v[k + 5], oy + v[k + 6]
+                pts.append((x, y))
+            ctrl = None
+
+    if pts:
+        paths.append(pts)
+    return paths
+
+
+def cubic(p0, p1, p2, p3):
+    out = []
+    for k in range(1, CURVE_STEPS + 1):
+        t = k / CURVE_STEPS
+        u = 1 - t
+        a, b, c, d = u * u * u, 3 * u * u * t, 3 * u * t * t, t * t * t
+        out.append(
+            (
+                a * p0[0] + b * p1[0] + c * p2[0] + d * p3[0],
+                a * p0[1] + b * p1[1] + c * p2[1] + d * p3[1],
+            )
+        )
+    return out
+
+
+def quadratic(p0, p1, p2):
+    out = []
+    for k in range(1, CURVE_STEPS + 1):
+        t = k / CURVE_STEPS
+        u = 1 - t
+        a, b, c = u * u, 2 * u * t, t * t
+        out.append(
+            (a * p0[0] + b * p1[0] + c * p2[0], a * p0[1] + b * p1[1] + c * p2[1])
+        )
+    return out
+
+
+def parse_transform(text):
+    matrix = IDENTITY
+    for name, args in TRANSFORM.findall(text):
+        v = [float(n) for n in NUMBER.findall(args)]
+        if name == "matrix" and len(v) == 6:
+            m = tuple(v)
+        elif name == "translate" and v:
+            m = (1.0, 0.0, 0.0, 1.0, v[0], v[1] if len(v) > 1 else 0.0)
+        elif name == "scale" and v:
+            m = (v[0], 0.0, 0.0, v[1] if len(v) > 1 else v[0], 0.0, 0.0)
+        elif name == "rotate" and v:
+            r = math.radians(v[0])
+            cos, sin = math.cos(r), math.sin(r)
+            m = (cos, sin, -sin, cos, 0.0, 0.0)
+            if len(v) == 3:
+                cx, cy = v[1], v[2]
+                m = multiply((1.0, 0.0, 0.0, 1.0, cx, cy), m)
+                m = multiply(m, (1.0, 0.0, 0.0, 1.0, -cx, -cy))
+        else:
+            continue
+        matrix = multiply(matrix, m)
+    return matrix
+
+
+def multiply(m, n):
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (
+        a * a2 + c * b2,
+        b * a2 + d * b2,
+        a * c2 + c * d2,
+        b * c2 + d * d2,
+        a * e2 + c * f2 + e,
+        b * e2 + d * f2 + f,
+    )
+
+
+def apply(m, x, y):
+    a, b, c, d, e, f = m
+    return QPointF(a * x + c * y + e, b * x + d * y + f)
+
+
+def transform_points(m, pts):
+    a, b, c, d, e, f = m
+    if b == 0 and c == 0:
+        return [QPointF(a * x + e, d * y + f) for x, y in pts]
+    return [QPointF(a * x + c * y + e, b * x + d * y + f) for x, y in pts]
+
+
+def parse_length(text, default):
+    found = NUMBER.match(text.strip())
+    return float(found.group()) if found else default
+
+
+def named_color(name):
+    """調色盤的顏色；在背景執行緒建立，不經過 palette 共用的快取。"""
+    return QColor(*palette.COLORS[name])
+
+
+def parse_color(text):
+    text = text.strip()
+    if text.startswith("rgb"):
+        values = [float(v) for v in NUMBER.findall(text)]
+        if len(values) >= 3:
+            r, g, b = (max(0, min(255, round(v))) for v in values[:3])
+            a = round(values[3] * 255) if len(values) > 3 else 255
+            return QColor(r, g, b, max(0, min(255, a)))
+        return None
+    color = QColor(text)
+    return color if color.isValid() else None
@@ -0,0 +1,170 @@
+# type: ignore
+"""
+粗細會變的筆跡：有繪圖板時看壓力，沒有就看速度（越快越細）。
+整筆算成一個外框多邊形，繪製時只要一次 drawPolygon。
+"""
+from PySide2.QtCore import QPointF
+from PySide2.QtGui import QPolygonF
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MIN_RATIO = 0.3  # 最細是原本粗細的幾倍
+FAST_SPEED = 3000  # px/s，超過這個速度就是最細
+CAP_STEPS = 6  # 圓頭的分段數
+
+
+class InkWidth:
+    """依壓力或速度算出每個點的粗細，不會超過原本的粗細。"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.last = None
+        self.t = None
+        self.speed = 0
+
+    def __call__(self, base, pos, t, pressure=None):
+        if pressure is not None:
+            return base * (MIN_RATIO + (1 - MIN_RATIO) * pressure)
+
+        if self.last is not None:
+            dt = max(t - self.t, 1e-3)
+            d = math.hypot(pos.x() - self.last.x(), pos.y() - self.last.y())
+            self.speed += (d / dt - self.speed) * 0.3
+        self.last = pos
+        self.t = t
+
+        ratio = 1 - (1 - MIN_RATIO) * min(self.speed / FAST_SPEED, 1)
+        return base * ratio
+
+
+class OutlineBuilder:
+    """預覽用：每來一個點就在左右兩邊各加一個點，不重算前面的部分。"""
+
+    def __init__(self):
+        self.points = []
+        self.widths = []
+        self.left = []
+        self.right = []
+        self.normal = (0, -1)
+
+    def add(self, p, w):
+        p = QPointF(p)
+        if self.points:
+            last = self.points[-1]
+            dx, dy = p.x() - last.x(), p.y() - last.y()
+            length = math.hypot(dx, dy)
+            if length == 0:
+                return
+            self.normal = (-dy / length, dx / length)
+            if len(self.points) == 1:
+                # 第一個點要等有方向後才知道兩側的位置
+                self.left, self.right = [], []
+                self.offset(last, self.widths[0])
+
+        self.points.append(p)
+        self.widths.append(w)
+        self.offset(p, w)
+
+    def offset(self, p, w):
+        nx, ny = self.normal
+        r = w / 2
+        self.left.append(QPointF(p.x() + nx * r, p.y() + ny * r))
+        self.right.append(QPointF(p.x() - nx * r, p.y() - ny * r))
+
+    def polygon(self):
+        return QPolygonF(self.left + self.right[::-1])
+
+
+# ============================================================
+#   Finished strokes
+# ============================================================
+
+
+def cap(center, r, angle, steps=CAP_STEPS):
+    """從 angle 往回轉半圈的圓頭（不含兩端點）。"""
+    out = []
+    for i in range(1, steps):
+        a = angle - math.pi * i / steps
+        out.append((center[0] + r * math.cos(a), center[1] + r * math.sin(a)))
+    return out
+
+
+def outline_points(xy, radius):
+    """xy: [(x, y)]，radius: 每個點的半徑 → 外框的點（純 Python）。"""
+    n = len(xy)
+    left, right, normals = [], [], []
+    for i in range(n):
+        a = xy[max(i - 1, 0)]
+        b = xy[min(i + 1, n - 1)]
+        tx, ty = b[0] - a[0], b[1] - a[1]
+        length = math.hypot(tx, ty) or 1
+        nx, ny = -ty / length, tx / length
+        normals.append((nx, ny))
+
+        x, y = xy[i]
+        r = radius[i]
+        left.append((x + nx * r, y + ny * r))
+        right.append((x - nx * r, y - ny * r))
+
+    end = math.atan2(normals[-1][1], normals[-1][0])
+    start = math.atan2(normals[0][1], normals[0][0])
+    return (
+        left
+        + cap(xy[-1], radius[-1], end)
+        + right[::-1]
+        + cap(xy[0], radius[0], start + math.pi)
+    )
+
+
+def outline_points_np(xy, radius):
+    """同上，用 NumPy 一次算完整條。"""
+    P = np.asarray(xy, dtype=float)
+    R = np.asarray(radius, dtype=float)[:, None]
+
+    T = np.gradient(P, axis=0)
+    length = np.hypot(T[:, 0], T[:, 1])[:, None]
+    length[length == 0] = 1
+    N = np.column_stack((-T[:, 1], T[:, 0])) / length
+
+    left = P + N * R
+    right = P - N * R
+
+    steps = np.arange(1, CAP_STEPS) * (math.pi / CAP_STEPS)
+    end = math.atan2(N[-1, 1], N[-1, 0]) - steps
+    start = math.atan2(N[0, 1], N[0, 0]) + math.pi - steps
+    end_cap = P[-1] + R[-1] * np.column_stack((np.cos(end), np.sin(end)))
+    start_cap = P[0] + R[0] * np.column_stack((np.cos(start), np.sin(start)))
+
+    return np.concatenate((left, end_cap, right[::-1], start_cap)).tolist()
+
+
+def outline_polygon(points, widths):
+    """整筆的外框多邊形，重複的點先去掉。"""
+    xy, radius = [], []
+    for p, w in zip(points, widths):
+        pt = (p.x(), p.y())
+        if xy and xy[-1] == pt:
+            continue
+        xy.append(pt)
+        radius.append(w / 2)
+
+    if len(xy) == 1:
+        x, y = xy[0]
+        r = radius[0]
+        ring = [
+            (x + r * math.cos(a), y + r * math.sin(a))
+            for a in (2 * math.pi * i / (2 * CAP_STEPS) for i in range(2 * CAP_STEPS))
+        ]
+        return QPolygonF([QPointF(*p) for p in ring])
+
+    if np is not None:
+        out = outline_points_np(xy, radius)
+    else:
+        out = outline_points(xy, radius)
+    return QPolygonF([QPointF(x, y) for x, y in out])
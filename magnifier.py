@@ -0,0 +1,195 @@
+# type: ignore
+"""
+放大鏡：把游標附近的一小塊螢幕放大顯示，投影時看程式碼用。
+擷取在背景執行緒，只抓游標附近那一小塊，直接接手 mss 抓到的 bytearray；
+GUI 執行緒把它包成 QImage（不複製），永遠只畫最新的一張，來不及畫的就丟掉。
+"""
+from PySide2.QtCore import Qt, QRectF, QTimer, Signal
+from PySide2.QtGui import QCursor, QImage, QPainter, QPainterPath
+from PySide2.QtWidgets import QWidget
+from mss import mss
+from mss.exception import ScreenShotError
+import math
+import threading
+import time
+
+import palette
+
+LENS_WIDTH = 360
+LENS_HEIGHT = 180
+ZOOM = 2.0
+LENS_GAP = 24  # 鏡片和擷取範圍的距離，鏡片放在擷取範圍旁邊，不會拍到自己
+FRAME_TIME = 1 / 60  # 秒
+
+
+class RegionCapture(threading.Thread):
+    """
+    背景擷取固定大小的一塊螢幕。mss 每次都會配置新的 bytearray，直接拿來當 ready，
+    不再複製一次；GUI 要畫時把 ready 換成 front。
+    背景永遠不碰正在顯示的那塊，GUI 也不用等背景。
+    """
+
+    def __init__(self, width, height, notify):
+        super().__init__(daemon=True)
+        self.width = width
+        self.height = height
+        self.front = bytearray(width * height * 4)
+        self.ready = None
+        self.fresh = False
+        self.region = None
+        self.lock = threading.Lock()
+        self.notify = notify
+        self.running = True
+
+    def request(self, left, top):
+        """下一張要抓的位置（實體像素），只留最新的要求。"""
+        with self.lock:
+            self.region = {
+                "left": left,
+                "top": top,
+                "width": self.width,
+                "height": self.height,
+            }
+
+    def run(self):
+        try:
+            # mss 的連線不能跨執行緒共用，要在這個執行緒裡建立
+            with mss() as sct:
+                while self.running:
+                    start = time.perf_counter()
+                    with self.lock:
+                        region = self.region
+                    if region is not None:
+                        raw = sct.grab(region).raw
+                        with self.lock:
+                            self.ready = raw
+                            notify = not self.fresh
+                            self.fresh = True
+                        # 上一張還沒畫就不再通知，不會在事件佇列裡排一串
+                        if notify:
+                            self.notify()
+                    time.sleep(max(0, FRAME_TIME - (time.perf_counter() - start)))
+        except ScreenShotError as e:
+            print(f"Error: screen capture failed: {e}")
+
+    def stop(self):
+        self.running = False
+
+    def take(self):
+        """換到最新的一張，回傳直接包著緩衝區的 QImage。"""
+        with self.lock:
+            if self.fresh:
+                self.front, self.ready = self.ready, None
+                self.fresh = False
+        return QImage(
+            self.front, self.width, self.height, self.width * 4, QImage.Format_RGB32
+        )
+
+
+class Magnifier(QWidget):
+    """跟著游標的放大鏡片，穿透模式下也能用。"""
+
+    frame_ready = Signal()
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.capture = None
+        self.hide()
+
+        self.frame_ready.connect(self.update)
+
+        # 游標位置只能在 GUI 執行緒讀，每幀讀一次並移動鏡片
+        self.timer = QTimer(self)
+        self.timer.setInterval(round(FRAME_TIME * 1000))
+        self.timer.timeout.connect(self.follow)
+
+    def toggle(self):
+        if self.capture is None:
+            self.start()
+        else:
+            self.stop()
+
+    def start(self):
+        dpr = self.devicePixelRatioF()
+        self.capture = RegionCapture(
+            round(LENS_WIDTH / ZOOM * dpr),
+            round(LENS_HEIGHT / ZOOM * dpr),
+            self.frame_ready.emit,
+        )
+        self.follow()
+        self.capture.start()
+        self.timer.start()
+        self.show()
+        self.raise_()
+
+    def stop(self):
+        if self.capture is not None:
+            self.capture.stop()
+            self.capture = None
+        self.timer.stop()
+        self.hide()
+
+    def follow(self):
+        parent = self.parentWidget()
+        pos = QCursor.pos()
+        local = parent.mapFromGlobal(pos)
+
+        # 擷取範圍以游標為中心，換成實體像素並夾在視窗（全螢幕）內
+        dpr = self.devicePixelRatioF()
+        screen = parent.window().geometry()
+        w, h = self.capture.width, self.capture.height
+        left = round(pos.x() * dpr) - w // 2
+        top = round(pos.y() * dpr) - h // 2
+        left = max(
+            round(screen.left() * dpr), min(left, round((screen.right() + 1) * dpr) - w)
+        )
+        top = max(
+            round(screen.top() * dpr), min(top, round((screen.bottom() + 1) * dpr) - h)
+        )
+        self.capture.request(left, top)
+
+        # 鏡片放在擷取範圍的右、左、上、下，找第一個放得下的位置，不會拍到自己
+        area = QRectF(
+            local.x() + left / dpr - pos.x(),
+            local.y() + top / dpr - pos.y(),
+            w / dpr,
+            h / dpr,
+        )
+        max_x = parent.width() - LENS_WIDTH
+        max_y = parent.height() - LENS_HEIGHT
+        cx = max(0, min(round(local.x() - LENS_WIDTH / 2), max_x))
+        cy = max(0, min(round(local.y() - LENS_HEIGHT / 2), max_y))
+        to_right = math.ceil(area.right()) + LENS_GAP
+        to_left = math.floor(area.left()) - LENS_GAP - LENS_WIDTH
+        above = math.floor(area.top()) - LENS_GAP - LENS_HEIGHT
+        below = math.ceil(area.bottom()) + LENS_GAP
+        if to_right <= max_x:
+            x, y = to_right, cy
+        elif to_left >= 0:
+            x, y = to_left, cy
+        elif above >= 0:
+            x, y = cx, above
+        else:
+            x, y = cx, min(below, max_y)
+        if self.x() != x or self.y() != y:
+            self.setGeometry(x, y, LENS_WIDTH, LENS_HEIGHT)
+
+    def paintEvent(self, event):
+        if self.capture is None:
+            return
+
+        p = QPainter(self)
+        rect = QRectF(self.rect()).adjusted(1, 1, -1, -1)
+        clip = QPainterPath()
+        clip.addRoundedRect(rect, 12, 12)
+
+        # 不做平滑縮放，放大後的字邊緣比較清楚
+        p.setClipPath(clip)
+        p.drawImage(rect, self.capture.take())
+        p.setClipping(False)
+
+        p.setRenderHint(QPainter.Antialiasing)
+        p.setPen(palette.pen(palette.ACCENT, 2))
+        p.setBrush(Qt.NoBrush)
+        p.drawPath(clip)
@@ -1,8 +1,49 @@
-from PySide2.QtWidgets import QApplication
-from window import Window
+import sys
+
+from daemon import COMMANDS, send_command
 
 if __name__ == "__main__":
-    app = QApplication([])
-    w = Window()
-    w.show()
+    args = sys.argv[1:]
+
+    # python main.py show / hide / toggle / quit
+    # 只用到 QtCore / QtNetwork，送完就結束，不用載入整個介面
+    if args and args[0] in COMMANDS:
+        if send_command(args[0]):
+            sys.exit(0)
+        if args[0] != "show":
+            sys.exit(1)
+
+    resident = "--daemon" in args
+    # 已經有常駐程式時交給它就好，不再開第二個
+    if resident and send_command("hide" if "--hidden" in args else "show"):
+        sys.exit(0)
+
+    from PySide2.QtWidgets import QApplication
+    from collab import DEFAULT_PORT, CollabClient, start_server_thread
+    from daemon import Daemon
+    from window import Window
+
+    app = QApplication(sys.argv)
+    w = Window(resident=resident)
+    if resident:
+        app.setQuitOnLastWindowClosed(False)
+        daemon = Daemon(w)
+
+    # python main.py --serve / --join host[:port]
+    join = None
+    if "--serve" in args:
+        start_server_thread()
+        join = "127.0.0.1"
+    if "--join" in args and args.index("--join") + 1 < len(args):
+        join = args[args.index("--join") + 1]
+    if join is not None:
+        host, _, port = join.partition(":")
+        collab = CollabClient(w.canva, host, int(port or DEFAULT_PORT))
+
+    # python main.py --import overlay.svg
+    if "--import" in args and args.index("--import") + 1 < len(args):
+        w.import_file(args[args.index("--import") + 1])
+
+    if not resident or "--hidden" not in args:
+        w.show_overlay()
     app.exec_()
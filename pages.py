@@ -0,0 +1,200 @@
+# type: ignore
+import os
+import pickle
+
+from geometry import SpatialIndex
+from history import History
+from session import decode_stroke, encode_stroke
+from strokes import stroke_bounds
+from tiles import TileStore
+
+LAYERS = ["background", "highlight", "pen"]  # 由下往上的繪製順序
+
+
+def rebase_layer(live, base, target):
+    """
+    把 base → target 之間本機的差異套到目前的筆畫 live 上（復原 / 重做用）。
+    別人同步過來的筆畫（"remote"）不會因為本機復原被加回或拿掉；
+    沒有別人的筆畫時結果就是 target。
+    """
+    live_ids = {id(s) for s in live}
+    base_ids = {id(s) for s in base}
+    target_ids = {id(s) for s in target}
+
+    out = [
+        s
+        for s in target
+        if id(s) in live_ids or (id(s) not in base_ids and not s.get("remote"))
+    ]
+    # 不在 target 裡的：本機在 base 之後拿掉的就不要，其餘（別人新加的）保留
+    out += [
+        s
+        for s in live
+        if id(s) not in target_ids and (id(s) not in base_ids or s.get("remote"))
+    ]
+    return out
+
+
+class Layer:
+    """一個圖層：自己的筆畫、空間索引與分塊快取。"""
+
+    def __init__(self, name, draw, locked=False):
+        self.name = name
+        self.locked = locked
+        self.strokes = []
+        self.index = SpatialIndex()
+        self.store = TileStore(lambda rect: self.index.query(rect, ordered=True), draw)
+
+    def set_strokes(self, strokes):
+        """換成另一組筆畫，只重畫有差異的格子。"""
+        old = {id(s) for s in self.strokes}
+        new = {id(s) for s in strokes}
+        changed = [s for s in self.strokes if id(s) not in new]
+        changed += [s for s in strokes if id(s) not in old]
+
+        self.strokes = strokes
+        self.index.clear()
+        for item in strokes:
+            self.index.insert(item, stroke_bounds(item))
+
+        if len(changed) > 256:
+            self.store.reset()
+        else:
+            for item in changed:
+                self.store.invalidate(stroke_bounds(item))
+
+    def add(self, item):
+        self.strokes.append(item)
+        self.index.insert(item, stroke_bounds(item))
+        self.store.add(item, stroke_bounds(item))
+
+    def extend(self, items):
+        """一次加入很多筆畫（匯入）：太多時分塊快取整個重畫，不逐筆畫上去。"""
+        self.strokes.extend(items)
+        for item in items:
+            self.index.insert(item, stroke_bounds(item))
+        if len(items) > 256:
+            self.store.reset()
+        else:
+            for item in items:
+                self.store.add(item, stroke_bounds(item))
+
+    def insert(self, position, item):
+        """放回指定位置（保持繪製順序）；分塊要重畫，不能直接疊在最上面。"""
+        position = min(position, len(self.strokes))
+        order = None
+        if position < len(self.strokes):
+            below = self.index.order_of(self.strokes[position - 1]) if position else 0
+            order = (below + self.index.order_of(self.strokes[position])) / 2
+        self.strokes.insert(position, item)
+        bounds = stroke_bounds(item)
+        self.index.insert(item, bounds, order)
+        self.store.invalidate(bounds)
+
+    def replace(self, mapping):
+        """筆畫換成看起來一樣的新物件（背景整理用）：保留順序，分塊不用重畫。"""
+        strokes = []
+        for item in self.strokes:
+            new = mapping.get(id(item))
+            if new is not None:
+                self.index.replace(item, new, stroke_bounds(new))
+                item = new
+            strokes.append(item)
+        self.strokes = strokes
+
+    def remove(self, items):
+        removed = {id(item) for item in items}
+        self.strokes = [s for s in self.strokes if id(s) not in removed]
+        for item in items:
+            self.index.remove(item)
+            self.store.invalidate(stroke_bounds(item))
+
+
+class Page:
+    """
+    一頁白板：固定的圖層、自己的歷史紀錄。
+    不在畫面上的頁面可以把筆畫與歷史寫到磁碟，釋放記憶體。
+    """
+
+    def __init__(self, draw, history_budget=64 * 1024 * 1024):
+        self.layers = {
+            name: Layer(name, draw, locked=(name == "background")) for name in LAYERS
+        }
+        self.history = History(history_budget, live=self.strokes)
+        self.history_index = -1
+        self.snapshot_revision = None  # 上一筆歷史紀錄時的筆畫版本號
+        self.spill_path = None
+        self.last_used = 0
+
+    def strokes(self):
+        out = []
+        for name in LAYERS:
+            out += self.layers[name].strokes
+        return out
+
+    def memory(self):
+        """粗估記憶體：分塊快取 + 每個點約 72 bytes。"""
+        tiles = sum(layer.store.memory() for layer in self.layers.values())
+        points = sum(len(s.get("points", ())) for s in self.strokes())
+        return tiles + points * 72
+
+    # ============================================================
+    #   Disk spill
+    # ============================================================
+
+    def spill(self, folder, name):
+        """把筆畫寫到磁碟、歷史全部移到歷史 log，丟掉快取。"""
+        if self.spill_path is not None:
+            return
+
+        # 先寫歷史：筆畫拿到 digest，讀回來後復原才認得出是同一筆
+        self.history.spill_all()
+
+        table = {}
+        encoded = []
+
+        def ref(item):
+            key = id(item)
+            if key not in table:
+                table[key] = len(encoded)
+                data = encode_stroke(item)
+                for k in ("digest", "remote"):
+                    if k in item:
+                        data[k] = item[k]
+                encoded.append(data)
+            return table[key]
+
+        data = {
+            "layers": {n: [ref(s) for s in l.strokes] for n, l in self.layers.items()},
+            "locked": {n: l.locked for n, l in self.layers.items()},
+        }
+
+        path = os.path.join(folder, name)
+        with open(path, "wb") as f:
+            pickle.dump((encoded, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.spill_path = path
+        for layer in self.layers.values():
+            layer.strokes = []
+            layer.index.clear()
+            layer.store.reset()
+
+    def load(self):
+        if self.spill_path is None:
+            return
+
+        with open(self.spill_path, "rb") as f:
+            encoded, data = pickle.load(f)
+        os.remove(self.spill_path)
+        self.spill_path = None
+
+        items = []
+        for fields in encoded:
+            item = decode_stroke(fields)
+            for k in ("digest", "remote"):
+                if k in fields:
+                    item[k] = fields[k]
+            items.append(item)
+        for name, ids in data["layers"].items():
+            self.layers[name].set_strokes([items[i] for i in ids])
+            self.layers[name].locked = data["locked"][name]
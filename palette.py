@@ -0,0 +1,54 @@
+# type: ignore
+from PySide2.QtCore import Qt
+from PySide2.QtGui import QColor, QPen
+
+COLORS = {
+    "white": (255, 255, 255),
+    "red": (248, 49, 47),
+    "orange": (255, 103, 35),
+    "yellow": (255, 176, 46),
+    "green": (0, 210, 106),
+    "blue": (0, 166, 237),
+    "purple": (199, 144, 241),
+    "gray": (128, 128, 128),
+}
+COLOR_CYCLE = ["white", "red", "orange", "yellow", "green", "blue", "purple"]
+
+ACCENT = QColor(255, 120, 0)
+POPUP = QColor(255, 200, 80)
+
+_colors = {}
+_pens = {}
+
+
+def qcolor(name, alpha=255):
+    key = (name, alpha)
+    color = _colors.get(key)
+    if color is None:
+        r, g, b = COLORS.get(name, COLORS["white"])
+        color = _colors[key] = QColor(r, g, b, alpha)
+    return color
+
+
+def rgba_color(r, g, b, a=255):
+    key = (r, g, b, a)
+    color = _colors.get(key)
+    if color is None:
+        color = _colors[key] = QColor(r, g, b, a)
+    return color
+
+
+def pen(color, width, tool="pen", style=Qt.SolidLine, cache=None):
+    """
+    依 (顏色, 粗細, 工具) 共用 QPen，畫面重繪時不再建立新物件。
+    GUI 執行緒以外要畫圖時傳入自己的 cache，不要動到共用的。
+    粗細取到 0.1px：縮放過或同步來的粗細是任意小數，不取整快取會一直長大。
+    """
+    if cache is None:
+        cache = _pens
+    width = round(width, 1)
+    key = (color.rgba(), width, tool, style)
+    p = cache.get(key)
+    if p is None:
+        p = cache[key] = QPen(color, width, style, Qt.RoundCap, Qt.RoundJoin)
+    return p
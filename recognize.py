@@ -0,0 +1,112 @@
+# type: ignore
+"""
+把手畫的直線、方框、橢圓、箭頭換成對應的簡單圖形，
+幾百個點的筆畫變成兩個點或一個矩形。
+"""
+from PySide2.QtCore import QPointF, QRectF
+import math
+
+from geometry import dist, points_rect, segment_dist
+
+MIN_SIZE = 20  # px，太小的筆畫不辨識
+LINE_TOLERANCE = 0.04  # 偏離直線的距離 / 長度
+CLOSED_GAP = 0.2  # 頭尾距離 / 總長，小於這個算封閉圖形
+RECT_TOLERANCE = 0.12  # 離最近邊的距離 / 短邊
+ELLIPSE_TOLERANCE = 0.15  # 正規化半徑和 1 的差
+ARROW_HEAD = 0.4  # 箭頭部分最長是箭身的幾倍
+
+
+def path_length(points):
+    return sum(dist(points[i - 1], points[i]) for i in range(1, len(points)))
+
+
+def is_straight(points, tolerance=LINE_TOLERANCE):
+    a, b = points[0], points[-1]
+    length = dist(a, b)
+    if length < MIN_SIZE:
+        return False
+    limit = max(3, length * tolerance)
+    return all(segment_dist(p, a, b) <= limit for p in points)
+
+
+def detect_arrow(points):
+    """一筆畫完的箭頭：先畫直直的箭身，最後在尖端附近畫箭頭。"""
+    start = points[0]
+    tip_i = max(range(len(points)), key=lambda i: dist(start, points[i]))
+    shaft, head = points[: tip_i + 1], points[tip_i:]
+    if len(shaft) < 2 or len(head) < 3 or not is_straight(shaft):
+        return None
+
+    tip = points[tip_i]
+    length = dist(start, tip)
+    if any(dist(tip, p) > length * ARROW_HEAD for p in head):
+        return None
+
+    # 箭頭要往箭身兩側張開，不能只是沿著箭身折回來
+    off = [segment_dist(p, start, tip) for p in head]
+    if max(off) < max(4, length * 0.05):
+        return None
+    return {"type": "arrow", "start": QPointF(start), "end": QPointF(tip)}
+
+
+def detect_rect(points, rect):
+    short = min(rect.width(), rect.height())
+    if short < MIN_SIZE:
+        return None
+
+    errors = []
+    for p in points:
+        errors.append(
+            min(
+                abs(p.x() - rect.left()),
+                abs(p.x() - rect.right()),
+                abs(p.y() - rect.top()),
+                abs(p.y() - rect.bottom()),
+            )
+        )
+    if max(errors) > short * RECT_TOLERANCE * 2:
+        return None
+    if sum(errors) / len(errors) > short * RECT_TOLERANCE / 2:
+        return None
+    return {"type": "rect", "rect": rect}
+
+
+def detect_ellipse(points, rect):
+    a, b = rect.width() / 2, rect.height() / 2
+    if min(a, b) * 2 < MIN_SIZE:
+        return None
+
+    c = rect.center()
+    errors = [
+        abs(math.hypot((p.x() - c.x()) / a, (p.y() - c.y()) / b) - 1) for p in points
+    ]
+    if max(errors) > ELLIPSE_TOLERANCE * 2:
+        return None
+    if sum(errors) / len(errors) > ELLIPSE_TOLERANCE / 2:
+        return None
+    return {"type": "ellipse", "rect": rect}
+
+
+def detect(points):
+    """回傳辨識出的圖形（type 與幾何資料），認不出來就是 None。"""
+    if len(points) < 3:
+        return None
+
+    if is_straight(points):
+        return {"type": "line", "start": QPointF(points[0]), "end": QPointF(points[-1])}
+
+    length = path_length(points)
+    if dist(points[0], points[-1]) > length * CLOSED_GAP:
+        return detect_arrow(points)
+
+    rect = QRectF(points_rect(points))
+    return detect_rect(points, rect) or detect_ellipse(points, rect)
+
+
+def recognize(item):
+    """自由筆畫 → 認得出來的話換成簡單圖形，保留顏色、粗細與工具。"""
+    shape = detect(item["points"])
+    if shape is None:
+        return item
+    base = {k: item[k] for k in ("color", "width", "tool") if k in item}
+    return {**shape, **base}
@@ -0,0 +1,125 @@
+# type: ignore
+"""
+把存好的 session 檔批次輸出成圖片（不開視窗）。
+
+python render.py sessions/*.json -o out --format png --jobs 4
+"""
+from PySide2.QtCore import QRect, QSize, Qt
+from PySide2.QtGui import QColor, QGuiApplication, QImage, QPainter
+from PySide2.QtSvg import QSvgGenerator
+from multiprocessing import Pool
+import argparse
+import os
+import sys
+import time
+
+from pages import LAYERS
+from session import count_points, decode_page, load_session
+from strokes import draw_item
+
+BACKGROUNDS = {
+    "black": (0, 0, 0, 255),
+    "trans": (0, 0, 0, 0),
+}
+
+_app = None
+
+
+def init_worker():
+    """每個 worker 行程建立一次離屏的 QGuiApplication。"""
+    global _app
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    _app = QGuiApplication.instance() or QGuiApplication([])
+
+
+def paint_page(painter, layers, background, rect):
+    painter.setRenderHint(QPainter.Antialiasing)
+    # 直接覆寫，透明背景才會真的把圖清成透明
+    painter.setCompositionMode(QPainter.CompositionMode_Source)
+    painter.fillRect(rect, QColor(*background))
+    painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+    for name in LAYERS:
+        for item in layers.get(name, ()):
+            draw_item(painter, item)
+
+
+def render_page(layers, size, background, path, fmt):
+    w, h = size
+    rect = QRect(0, 0, w, h)
+
+    if fmt == "svg":
+        target = QSvgGenerator()
+        target.setFileName(path)
+        target.setSize(QSize(w, h))
+        target.setViewBox(rect)
+    else:
+        target = QImage(w, h, QImage.Format_ARGB32_Premultiplied)
+        target.fill(Qt.transparent)
+
+    p = QPainter(target)
+    paint_page(p, layers, background, rect)
+    p.end()
+
+    if fmt != "svg":
+        target.save(path, fmt.upper())
+
+
+def render_file(job):
+    path, out_dir, fmt, background = job
+
+    data = load_session(path)
+    if background is None:
+        background = tuple(data.get("board_color", BACKGROUNDS["trans"]))
+        if background[3] != 255:
+            # 和螢幕存檔一樣，半透明的繪圖背景當作透明
+            background = BACKGROUNDS["trans"]
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    pages = data["pages"]
+    points = 0
+
+    for i, page in enumerate(pages):
+        name = stem if len(pages) == 1 else f"{stem}-p{i + 1}"
+        out = os.path.join(out_dir, f"{name}.{fmt}")
+        render_page(decode_page(page), data["size"], background, out, fmt)
+        points += count_points(page)
+
+    return len(pages), points
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render saved pen sessions.")
+    parser.add_argument("sessions", nargs="+", help="session .json files")
+    parser.add_argument("-o", "--out", default=".", help="output directory")
+    parser.add_argument("-f", "--format", choices=["png", "svg"], default="png")
+    parser.add_argument(
+        "-b",
+        "--background",
+        choices=list(BACKGROUNDS),
+        help="override the saved board background",
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    background = BACKGROUNDS.get(args.background)
+    jobs = [(path, args.out, args.format, background) for path in args.sessions]
+
+    start = time.perf_counter()
+    with Pool(max(1, args.jobs), initializer=init_worker) as pool:
+        results = pool.map(render_file, jobs, chunksize=1)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    files = len(jobs)
+    pages = sum(r[0] for r in results)
+    points = sum(r[1] for r in results)
+    print(
+        f"{files} files, {pages} pages, {points} points in {elapsed:.2f}s "
+        f"({files / elapsed:.1f} files/s, {points / elapsed:.0f} points/s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+# type: ignore
+from PySide2.QtCore import QObject, Signal
+
+ASPECTS = (
+    "strokes",
+    "history",
+    "page",
+    "tool",
+    "size",
+    "shape",
+    "color",
+    "board",
+    "view",
+)
+
+
+class Scene(QObject):
+    """
+    畫布狀態的版本號：筆畫、工具、粗細、顏色、黑板……各有一個只增不減的計數器，
+    真的有變化時才加一並送出 changed(aspect)。
+    工具列、游標、歷史紀錄與背景整理只要比對版本號或接 changed，就知道要不要重做。
+    """
+
+    changed = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.revisions = dict.fromkeys(ASPECTS, 0)
+
+    def revision(self, aspect):
+        return self.revisions[aspect]
+
+    def bump(self, aspect):
+        self.revisions[aspect] += 1
+        self.changed.emit(aspect)
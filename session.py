@@ -0,0 +1,109 @@
+# type: ignore
+from PySide2.QtCore import QPointF, QRectF
+import json
+
+import palette
+
+VERSION = 1
+
+
+def flat_points(points):
+    out = []
+    for p in points:
+        out.append(round(p.x(), 2))
+        out.append(round(p.y(), 2))
+    return out
+
+
+def unflat_points(values):
+    return [QPointF(values[i], values[i + 1]) for i in range(0, len(values) - 1, 2)]
+
+
+def encode_stroke(item):
+    """筆畫 → 只含數字與字串的 dict，可以存成 JSON 或寫到磁碟。"""
+    c = item["color"]
+    data = {
+        "type": item["type"],
+        "tool": item.get("tool", "pen"),
+        "layer": item.get("layer", "pen"),
+        "color": [c.red(), c.green(), c.blue(), c.alpha()],
+        "width": item["width"],
+    }
+    if "time" in item:
+        data["time"] = round(item["time"], 3)
+    if item.get("smooth"):
+        data["smooth"] = True
+
+    t = item["type"]
+    if t == "pen":
+        data["points"] = flat_points(item["points"])
+        if "widths" in item:
+            data["widths"] = [round(w, 2) for w in item["widths"]]
+    elif t in ("line", "arrow"):
+        data["points"] = flat_points([item["start"], item["end"]])
+    elif t in ("rect", "ellipse"):
+        r = QRectF(item["rect"])
+        data["rect"] = [r.x(), r.y(), r.width(), r.height()]
+
+    return data
+
+
+def decode_stroke(data, color=palette.rgba_color):
+    """color 用來建立顏色；GUI 執行緒以外解碼時傳 QColor，不要動到共用的快取。"""
+    item = {
+        "type": data["type"],
+        "color": color(*data["color"]),
+        "width": data["width"],
+        "tool": data.get("tool", "pen"),
+        "layer": data.get("layer", "pen"),
+    }
+    if "time" in data:
+        item["time"] = data["time"]
+    if data.get("smooth"):
+        item["smooth"] = True
+
+    t = data["type"]
+    if t == "pen":
+        item["points"] = unflat_points(data["points"])
+        if "widths" in data:
+            item["widths"] = data["widths"]
+    elif t in ("line", "arrow"):
+        item["start"], item["end"] = unflat_points(data["points"])
+    elif t in ("rect", "ellipse"):
+        item["rect"] = QRectF(*data["rect"])
+
+    return item
+
+
+# ============================================================
+#   Session files
+# ============================================================
+
+
+def save_session(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+
+
+def load_session(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version", 1) > VERSION:
+        raise ValueError(f"Unsupported session version: {data['version']}")
+    return data
+
+
+def decode_page(page):
+    """session 裡的一頁 → {圖層: [筆畫]}"""
+    return {
+        name: [decode_stroke(d) for d in items]
+        for name, items in page["layers"].items()
+    }
+
+
+def count_points(page):
+    total = 0
+    for items in page["layers"].values():
+        for d in items:
+            total += len(d.get("points", ())) // 2
+    return total
@@ -0,0 +1,89 @@
+# type: ignore
+from PySide2.QtCore import QPointF
+from PySide2.QtGui import QPainterPath
+import math
+
+
+class OneEuroFilter:
+    """
+    輸入點的平滑濾波：慢慢畫時壓掉手抖，畫得快時幾乎不延遲。
+    min_cutoff 越小越平滑，beta 越大快速移動時越跟手。
+    """
+
+    def __init__(self, min_cutoff=3.0, beta=0.01, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.prev = None
+        self.speed = QPointF()
+        self.t = None
+
+    @staticmethod
+    def alpha(cutoff, dt):
+        tau = 1 / (2 * math.pi * cutoff)
+        return 1 / (1 + tau / dt)
+
+    def __call__(self, p, t):
+        p = QPointF(p)
+        if self.prev is None:
+            self.prev = p
+            self.t = t
+            return p
+
+        dt = max(t - self.t, 1e-3)
+        self.t = t
+
+        speed = (p - self.prev) / dt
+        self.speed += (speed - self.speed) * self.alpha(self.d_cutoff, dt)
+
+        cutoff = self.min_cutoff + self.beta * math.hypot(
+            self.speed.x(), self.speed.y()
+        )
+        self.prev = self.prev + (p - self.prev) * self.alpha(cutoff, dt)
+        return self.prev
+
+
+class SplineBuilder:
+    """
+    一邊收點一邊把 Catmull-Rom 曲線接到 QPainterPath 上。
+    每一段要等下一個點才知道切線，所以最後一段先用直線（tail）代替。
+    """
+
+    def __init__(self):
+        self.points = []
+        self.path = QPainterPath()
+
+    def add(self, p):
+        pts = self.points
+        pts.append(QPointF(p))
+        n = len(pts)
+
+        if n == 1:
+            self.path.moveTo(p)
+        elif n >= 3:
+            self.segment(pts[max(n - 4, 0)], pts[n - 3], pts[n - 2], pts[n - 1])
+
+    def segment(self, p0, p1, p2, p3):
+        self.path.cubicTo(p1 + (p2 - p0) / 6, p2 - (p3 - p1) / 6, p2)
+
+    def tail(self):
+        """還沒定案的最後一段，預覽時用直線畫。"""
+        if len(self.points) < 2:
+            return None
+        return self.points[-2], self.points[-1]
+
+    def finish(self):
+        pts = self.points
+        if len(pts) >= 2:
+            self.segment(pts[max(len(pts) - 3, 0)], pts[-2], pts[-1], pts[-1])
+        return self.path
+
+
+def spline_path(points):
+    builder = SplineBuilder()
+    for p in points:
+        builder.add(p)
+    return builder.finish()
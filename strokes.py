@@ -0,0 +1,225 @@
+# type: ignore
+from PySide2.QtCore import Qt, QPointF, QRectF
+from PySide2.QtGui import QPainterPath, QPainterPathStroker, QPolygonF
+import math
+
+from geometry import line_hit, points_rect, simplify
+from ink import outline_polygon
+from smoothing import spline_path
+import palette
+
+ARROW_ANGLE = math.radians(28)
+
+
+def arrow_head(start, end, width):
+    """箭頭兩翼的端點，長度跟著筆寬變。"""
+    length = max(14, width * 4)
+    angle = math.atan2(end.y() - start.y(), end.x() - start.x())
+    wings = []
+    for side in (-1, 1):
+        a = angle + math.pi + side * ARROW_ANGLE
+        wings.append(
+            QPointF(end.x() + length * math.cos(a), end.y() + length * math.sin(a))
+        )
+    return wings
+
+
+def stroke_bounds(item):
+    """筆畫外框（含筆寬），算一次後存在筆畫上。"""
+    bbox = item.get("bbox")
+    if bbox is None:
+        pad = item["width"] / 2 + 1
+        t = item["type"]
+
+        if t == "pen":
+            bbox = points_rect(item["points"], pad)
+        elif t == "line":
+            bbox = points_rect([item["start"], item["end"]], pad)
+        elif t == "arrow":
+            head = arrow_head(item["start"], item["end"], item["width"])
+            bbox = points_rect([item["start"], item["end"], *head], pad)
+        elif t in ("rect", "ellipse"):
+            bbox = QRectF(item["rect"]).adjusted(-pad, -pad, pad, pad)
+        else:
+            bbox = QRectF()
+
+        item["bbox"] = bbox
+    return bbox
+
+
+def stroke_hit(item, p, r):
+    r += item["width"] / 2
+    t = item["type"]
+
+    if t == "pen":
+        pts = item["points"]
+        if len(pts) == 1:
+            return line_hit(p, pts[0], pts[0], r)
+        return any(line_hit(p, pts[i - 1], pts[i], r) for i in range(1, len(pts)))
+
+    elif t == "line":
+        return line_hit(p, item["start"], item["end"], r)
+
+    elif t == "arrow":
+        end = item["end"]
+        head = arrow_head(item["start"], end, item["width"])
+        return line_hit(p, item["start"], end, r) or any(
+            line_hit(p, w, end, r) for w in head
+        )
+
+    elif t == "rect":
+        rect = item["rect"]
+        outer = QRectF(rect).adjusted(-r, -r, r, r)
+        inner = QRectF(rect).adjusted(r, r, -r, -r)
+        return outer.contains(p) and not inner.contains(p)
+
+    elif t == "ellipse":
+        # 用正規化半徑估計到橢圓邊的距離
+        rect = QRectF(item["rect"])
+        c = rect.center()
+        a, b = max(rect.width() / 2, 1e-6), max(rect.height() / 2, 1e-6)
+        k = math.hypot((p.x() - c.x()) / a, (p.y() - c.y()) / b)
+        return abs(k - 1) * min(a, b) <= r
+
+    return False
+
+
+def smooth_path(item):
+    """平滑筆畫的曲線，算一次後存在筆畫上。"""
+    path = item.get("path")
+    if path is None:
+        path = item["path"] = spline_path(item["points"])
+    return path
+
+
+def stroke_polygon(item):
+    """粗細會變的筆畫的外框，算一次後存在筆畫上。"""
+    polygon = item.get("outline")
+    if polygon is None:
+        polygon = item["outline"] = outline_polygon(item["points"], item["widths"])
+    return polygon
+
+
+def stroke_outline(item):
+    path = QPainterPath()
+    t = item["type"]
+
+    if t == "pen" and "widths" in item:
+        path.addPolygon(stroke_polygon(item))
+        return path
+
+    if t == "pen" and item.get("smooth"):
+        path = smooth_path(item)
+    elif t == "pen":
+        pts = item["points"]
+        path.moveTo(pts[0])
+        for pt in pts[1:]:
+            path.lineTo(pt)
+    elif t == "line":
+        path.moveTo(item["start"])
+        path.lineTo(item["end"])
+    elif t == "arrow":
+        end = item["end"]
+        left, right = arrow_head(item["start"], end, item["width"])
+        path.moveTo(item["start"])
+        path.lineTo(end)
+        path.moveTo(left)
+        path.lineTo(end)
+        path.lineTo(right)
+    elif t == "rect":
+        path.addRect(QRectF(item["rect"]))
+    elif t == "ellipse":
+        path.addEllipse(QRectF(item["rect"]))
+
+    stroker = QPainterPathStroker()
+    stroker.setWidth(max(1, item["width"]))
+    return stroker.createStroke(path)
+
+
+CACHED = ("bbox", "lod", "path", "outline", "digest")
+
+
+def transform_stroke(item, offset, scale=1.0, origin=None):
+    """
+    以 origin 為中心縮放 scale 倍再平移 offset，回傳新的筆畫。
+    原本的筆畫不動（歷史快照還共用著），快取與同步用的 id 都不帶過去。
+    """
+    origin = QPointF() if origin is None else origin
+
+    def move(p):
+        return origin + (QPointF(p) - origin) * scale + offset
+
+    new = {
+        k: v for k, v in item.items() if k not in CACHED and k not in ("id", "remote")
+    }
+    new["width"] = item["width"] * scale
+    t = item["type"]
+
+    if t == "pen":
+        new["points"] = [move(p) for p in item["points"]]
+        if "widths" in item:
+            new["widths"] = [w * scale for w in item["widths"]]
+        new.pop("packed", None)
+    elif t in ("line", "arrow"):
+        new["start"] = move(item["start"])
+        new["end"] = move(item["end"])
+    elif t in ("rect", "ellipse"):
+        rect = QRectF(item["rect"])
+        new["rect"] = QRectF(move(rect.topLeft()), move(rect.bottomRight()))
+
+    return new
+
+
+def stroke_intersects(item, rect):
+    if not stroke_bounds(item).intersects(rect):
+        return False
+    return stroke_outline(item).intersects(rect)
+
+
+def lod_points(item, tolerance):
+    """縮小顯示用的簡化點，依容許誤差快取在筆畫上。"""
+    lod = item.get("lod")
+    if lod is None:
+        lod = item["lod"] = {}
+
+    pts = lod.get(tolerance)
+    if pts is None:
+        pts = lod[tolerance] = simplify(item["points"], tolerance)
+    return pts
+
+
+def draw_item(painter, item, lod=None, pens=None):
+    painter.setPen(
+        palette.pen(item["color"], item["width"], item.get("tool"), cache=pens)
+    )
+    painter.setBrush(Qt.NoBrush)
+
+    t = item["type"]
+
+    if t == "pen" and lod is None and "widths" in item:
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(item["color"])
+        painter.drawPolygon(stroke_polygon(item), Qt.WindingFill)
+
+    elif t == "pen" and lod is None and item.get("smooth"):
+        painter.drawPath(smooth_path(item))
+
+    elif t == "pen":
+        pts = item["points"] if lod is None else lod_points(item, lod)
+        for i in range(1, len(pts)):
+            painter.drawLine(pts[i - 1], pts[i])
+
+    elif t == "line":
+        painter.drawLine(item["start"], item["end"])
+
+    elif t == "arrow":
+        end = item["end"]
+        left, right = arrow_head(item["start"], end, item["width"])
+        painter.drawLine(item["start"], end)
+        painter.drawPolyline(QPolygonF([left, end, right]))
+
+    elif t == "rect":
+        painter.drawRect(item["rect"])
+
+    elif t == "ellipse":
+        painter.drawEllipse(item["rect"])
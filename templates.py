@@ -0,0 +1,82 @@
+# type: ignore
+"""
+黑板底紋（方格、橫線、點陣）。
+一個週期的圖案只畫一次，依 (底紋, 顏色, 格距, DPR) 快取成 QPixmap，
+重繪時用 drawTiledPixmap 鋪滿，跟著黑板平移縮放，不用每幀重畫線條。
+"""
+from PySide2.QtCore import Qt, QPointF, QRectF
+from PySide2.QtGui import QColor, QPainter, QPixmap
+import math
+
+TEMPLATES = ["plain", "grid", "ruled", "dots"]
+SPACING = 40  # 場景座標的格距
+MIN_SPACING = 10  # px，縮小到比這更密時改用兩倍格距
+LINE_COLOR = QColor(255, 255, 255, 40)
+DOT_COLOR = QColor(255, 255, 255, 90)
+CACHE_SIZE = 32
+
+_tiles = {}
+
+
+def screen_spacing(scale):
+    """畫面上的格距；縮得太小時每次加倍，線不會擠成一片。"""
+    spacing = SPACING * scale
+    if spacing < MIN_SPACING:
+        spacing *= 2 ** math.ceil(math.log2(MIN_SPACING / spacing))
+    return spacing
+
+
+def pattern_tile(name, color, spacing, dpr):
+    """一個週期的圖案（底色 + 線或點），線畫在格子中間，鋪貼時不會被切到。"""
+    side = max(1, round(spacing * dpr))
+    key = (name, color.rgba(), side, dpr)
+    pix = _tiles.get(key)
+    if pix is not None:
+        return pix
+
+    if len(_tiles) >= CACHE_SIZE:
+        _tiles.clear()
+
+    pix = QPixmap(side, side)
+    # 用實際像素數反推比例，邏輯尺寸剛好等於格距，鋪很多格也不會累積誤差
+    pix.setDevicePixelRatio(side / spacing)
+    pix.fill(color)
+
+    p = QPainter(pix)
+    mid = spacing / 2
+    line = 1 / dpr
+    if name in ("grid", "ruled"):
+        p.fillRect(QRectF(0, mid, spacing, line), LINE_COLOR)
+    if name == "grid":
+        p.fillRect(QRectF(mid, 0, line, spacing), LINE_COLOR)
+    if name == "dots":
+        r = min(1.5, spacing / 8)
+        p.setRenderHint(QPainter.Antialiasing)
+        p.setPen(Qt.NoPen)
+        p.setBrush(DOT_COLOR)
+        p.drawEllipse(QPointF(mid, mid), r, r)
+    p.end()
+
+    _tiles[key] = pix
+    return pix
+
+
+def draw_template(painter, rect, name, color, view, dpr):
+    """用 name 的底紋填滿 rect（畫面座標），格線對齊場景座標。"""
+    if name == "plain":
+        painter.fillRect(rect, color)
+        return
+
+    spacing = screen_spacing(view.scale)
+    pix = pattern_tile(name, color, spacing, dpr)
+
+    # 場景原點落在格子中間的線上
+    origin = view.offset - QPointF(spacing / 2, spacing / 2)
+    sx = (rect.x() - origin.x()) % spacing
+    sy = (rect.y() - origin.y()) % spacing
+    painter.drawTiledPixmap(QRectF(rect), pix, QPointF(sx, sy))
+
+
+def next_template(name, reverse=False):
+    i = TEMPLATES.index(name) if name in TEMPLATES else 0
+    return TEMPLATES[(i + (-1 if reverse else 1)) % len(TEMPLATES)]
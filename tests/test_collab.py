@@ -0,0 +1,70 @@
+# type: ignore
+import os
+import time
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide2.QtCore import QPointF
+from PySide2.QtNetwork import QAbstractSocket
+from PySide2.QtWidgets import QApplication
+
+app = QApplication.instance() or QApplication([])
+
+import collab
+from canva import Canva
+
+PORT = 48791
+
+
+def pump(ms):
+    end = time.time() + ms / 1000
+    while time.time() < end:
+        app.processEvents()
+        time.sleep(0.005)
+
+
+class ResyncTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        collab.start_server_thread("127.0.0.1", PORT)
+
+    def setUp(self):
+        self.limit = collab.MAX_PENDING
+        collab.MAX_PENDING = 50
+
+    def tearDown(self):
+        collab.MAX_PENDING = self.limit
+
+    def test_overflow_reconnects_once(self):
+        canva = Canva()
+        client = collab.CollabClient(canva, "127.0.0.1", PORT)
+        pump(300)
+        self.assertTrue(client.online)
+
+        connects = []
+        client.sock.stateChanged.connect(
+            lambda s: s == QAbstractSocket.ConnectingState and connects.append(s)
+        )
+        # 一次加很多筆（像匯入），事件迴圈來不及送出
+        for i in range(collab.MAX_PENDING + 10):
+            canva.add_stroke(
+                {
+                    "type": "line",
+                    "tool": "pen",
+                    "color": canva.pen_color,
+                    "width": 4,
+                    "start": QPointF(i, 10),
+                    "end": QPointF(i, 40),
+                }
+            )
+        pump(2500)
+
+        self.assertEqual(len(connects), 1)
+        self.assertTrue(client.online)
+        self.assertFalse(client.reconnect_timer.isActive())
+        client.sock.abort()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+# type: ignore
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide2.QtCore import QPointF
+from PySide2.QtWidgets import QApplication
+
+app = QApplication.instance() or QApplication([])
+
+from canva import Canva
+
+
+def line(canva, y):
+    canva.add_stroke(
+        {
+            "type": "line",
+            "tool": "pen",
+            "color": canva.pen_color,
+            "width": 4,
+            "start": QPointF(10, y),
+            "end": QPointF(200, y),
+        }
+    )
+    canva.add_history_snapshot()
+
+
+class SpillTest(unittest.TestCase):
+    def test_undo_after_reload(self):
+        canva = Canva()
+        for y in (20, 40, 60):
+            line(canva, y)
+        self.assertEqual(len(canva.strokes), 3)
+
+        with tempfile.TemporaryDirectory() as folder:
+            canva.page.spill(folder, "page.bin")
+            self.assertEqual(canva.strokes, [])
+            canva.page.load()
+
+        self.assertEqual(len(canva.strokes), 3)
+        canva.undo()
+        self.assertEqual(len(canva.strokes), 2)
+        canva.undo()
+        self.assertEqual(len(canva.strokes), 1)
+        canva.redo()
+        self.assertEqual(len(canva.strokes), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
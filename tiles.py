@@ -0,0 +1,115 @@
+# type: ignore
+from PySide2.QtCore import Qt, QRectF
+from PySide2.QtGui import QImage, QPainter
+
+TILE = 256
+
+
+class TileStore:
+    """
+    已完成筆畫的分塊快取。
+    格子切在「縮放後的場景座標」上，所以平移不用重畫，只有縮放會清空。
+    沒有筆畫的格子只記 None，不配置圖片。
+    """
+
+    def __init__(self, query, draw, tile=TILE):
+        self.query = query  # query(scene_rect) -> 依繪製順序的筆畫
+        self.draw = draw  # draw(painter, items, scale)
+        self.tile = tile
+        self.scale = 1.0
+        self.dpr = 1.0
+        self.tiles = {}
+
+    def sync(self, scale, dpr):
+        if scale != self.scale or dpr != self.dpr:
+            self.scale = scale
+            self.dpr = dpr
+            self.tiles = {}
+
+    def reset(self):
+        self.tiles = {}
+
+    def trim(self, keep=None):
+        """丟掉 keep（縮放後的場景座標）以外的格子，之後需要再重畫。"""
+        if keep is None:
+            self.tiles = {}
+            return
+        visible = set(self._keys(keep))
+        for key in [k for k in self.tiles if k not in visible]:
+            del self.tiles[key]
+
+    def memory(self):
+        side = int(self.tile * self.dpr)
+        return sum(side * side * 4 for img in self.tiles.values() if img is not None)
+
+    def _keys(self, rect):
+        t = self.tile
+        x0, x1 = int(rect.left() // t), int(rect.right() // t)
+        y0, y1 = int(rect.top() // t), int(rect.bottom() // t)
+        return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+    def _scaled(self, scene_rect):
+        s = self.scale
+        return QRectF(
+            scene_rect.x() * s,
+            scene_rect.y() * s,
+            scene_rect.width() * s,
+            scene_rect.height() * s,
+        )
+
+    def _scene(self, key):
+        t = self.tile / self.scale
+        return QRectF(key[0] * t, key[1] * t, t, t)
+
+    def _new_image(self):
+        side = int(self.tile * self.dpr)
+        img = QImage(side, side, QImage.Format_ARGB32_Premultiplied)
+        img.setDevicePixelRatio(self.dpr)
+        img.fill(Qt.transparent)
+        return img
+
+    def _paint(self, img, key, items):
+        p = QPainter(img)
+        p.setRenderHint(QPainter.Antialiasing)
+        p.translate(-key[0] * self.tile, -key[1] * self.tile)
+        p.scale(self.scale, self.scale)
+        self.draw(p, items, self.scale)
+        p.end()
+
+    def _render(self, key):
+        items = self.query(self._scene(key))
+        if not items:
+            return None
+
+        img = self._new_image()
+        self._paint(img, key, items)
+        return img
+
+    def invalidate(self, scene_rect):
+        """範圍內的格子下次顯示時重畫。"""
+        if scene_rect.isEmpty():
+            return
+        for key in self._keys(self._scaled(scene_rect)):
+            self.tiles.pop(key, None)
+
+    def add(self, item, scene_rect):
+        """新筆畫在最上層，直接畫到已存在的格子上，不用整格重畫。"""
+        for key in self._keys(self._scaled(scene_rect)):
+            if key not in self.tiles:
+                continue
+
+            img = self.tiles[key]
+            if img is None:
+                img = self.tiles[key] = self._new_image()
+            self._paint(img, key, [item])
+
+    def paint(self, painter, scaled_rect):
+        """把 scaled_rect（縮放後的場景座標）內的格子貼到 painter。"""
+        t = self.tile
+        for key in self._keys(scaled_rect):
+            if key not in self.tiles:
+                self.tiles[key] = self._render(key)
+
+            img = self.tiles[key]
+            if img is not None:
+                painter.drawImage(key[0] * t, key[1] * t, img)
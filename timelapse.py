@@ -0,0 +1,229 @@
+# type: ignore
+"""
+把 session 的筆畫依時間順序重播，輸出成動畫或影格。
+
+python timelapse.py session.json out.gif --fps 30
+python timelapse.py session.json frames/ --format png
+python timelapse.py session.json - --format raw | ffmpeg -f rawvideo ...
+"""
+from PySide2.QtGui import QColor, QGuiApplication, QImage, QPainter
+from queue import Queue
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+
+from pages import LAYERS
+from render import BACKGROUNDS
+from session import decode_page, load_session
+from strokes import draw_item
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+MAX_FRAMES = 300
+PIL_MEMORY = 256 * 1024 * 1024  # GIF / APNG：Pillow 存檔前會留住所有影格
+_DONE = object()
+
+
+def replay_order(layers):
+    """依完成時間排序；沒有時間的舊筆畫照圖層順序。"""
+    items = [s for name in LAYERS for s in layers.get(name, ())]
+    return sorted(items, key=lambda s: s.get("time", 0))
+
+
+def replay_frames(items, size, background, per_frame=1, scale=1.0):
+    """
+    每一格只把新的筆畫畫到上一格上，不重畫全部。
+    產生的是同一張 QImage，需要保留時請 copy()。
+    """
+    w, h = int(size[0] * scale), int(size[1] * scale)
+    frame = QImage(w, h, QImage.Format_ARGB32_Premultiplied)
+    frame.fill(QColor(*background))
+
+    p = QPainter(frame)
+    p.setRenderHint(QPainter.Antialiasing)
+    p.scale(scale, scale)
+
+    yield frame
+    for i, item in enumerate(items, 1):
+        draw_item(p, item)
+        if i % per_frame == 0 or i == len(items):
+            yield frame
+    p.end()
+
+
+class Encoder(threading.Thread):
+    """在背景執行緒編碼；佇列有上限，產生太快時會等待，記憶體不會一直長。"""
+
+    def __init__(self, path, fmt, fps, depth=8):
+        super().__init__(daemon=True)
+        self.path = path
+        self.fmt = fmt
+        self.fps = fps
+        self.queue = Queue(maxsize=depth)
+        self.count = 0
+        self.error = None
+
+    def put(self, frame):
+        self.queue.put(frame.copy())
+
+    def finish(self):
+        self.queue.put(_DONE)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+    def frames(self):
+        while True:
+            frame = self.queue.get()
+            if frame is _DONE:
+                return
+            self.count += 1
+            yield frame
+
+    def run(self):
+        try:
+            getattr(self, f"write_{self.fmt}")()
+        except Exception as e:
+            self.error = e
+            # 把剩下的影格消化掉，避免生產端卡住
+            for _ in self.frames():
+                pass
+
+    def write_png(self):
+        os.makedirs(self.path, exist_ok=True)
+        for frame in self.frames():
+            frame.save(os.path.join(self.path, f"frame_{self.count:05d}.png"), "PNG")
+
+    def write_raw(self):
+        out = sys.stdout.buffer if self.path == "-" else open(self.path, "wb")
+        try:
+            for frame in self.frames():
+                rgba = frame.convertToFormat(QImage.Format_RGBA8888)
+                out.write(bytes(rgba.constBits()))
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+
+    def write_pil(self):
+        if Image is None:
+            raise RuntimeError("GIF / APNG export needs Pillow: pip install pillow")
+
+        def pil_frames():
+            for frame in self.frames():
+                rgba = frame.convertToFormat(QImage.Format_RGBA8888)
+                size = (rgba.width(), rgba.height())
+                data = bytes(rgba.constBits())
+                yield Image.frombuffer(
+                    "RGBA", size, data, "raw", "RGBA", rgba.bytesPerLine(), 1
+                )
+
+        # Pillow 的 save_all 會先把所有影格收齊才寫檔，記憶體上限由 export 縮小影格控制
+        frames = pil_frames()
+        first = next(frames)
+        if self.fmt == "apng":
+            # Pillow 的 APNG 會把影格走兩遍，只能先收成 list
+            frames = list(frames)
+        first.save(
+            self.path,
+            "GIF" if self.fmt == "gif" else "PNG",
+            save_all=True,
+            append_images=frames,
+            duration=int(1000 / self.fps),
+            loop=0,
+            disposal=1,
+        )
+
+    write_gif = write_pil
+    write_apng = write_pil
+
+
+def pil_scale(count, size, scale, depth):
+    """Pillow 輸出時，縮小到留住的影格加起來不超過 PIL_MEMORY（depth: 每像素幾 bytes）。"""
+    need = count * size[0] * size[1] * scale * scale * depth
+    if need <= PIL_MEMORY:
+        return scale
+    return scale * math.sqrt(PIL_MEMORY / need)
+
+
+def export(items, size, background, path, fmt, fps=30, per_frame=None, scale=1.0):
+    if per_frame is None:
+        per_frame = max(1, math.ceil(len(items) / MAX_FRAMES))
+
+    if fmt in ("gif", "apng"):
+        count = math.ceil(len(items) / per_frame) + 1
+        # GIF 的影格會先轉成調色盤（1 byte），APNG 留的是 RGBA
+        fitted = pil_scale(count, size, scale, 1 if fmt == "gif" else 4)
+        if fitted < scale:
+            print(
+                f"Note: {count} frames scaled to {fitted:.2f} to fit in memory;"
+                " use --format raw with ffmpeg for full size",
+                file=sys.stderr,
+            )
+            scale = fitted
+
+    encoder = Encoder(path, fmt, fps)
+    encoder.start()
+    for frame in replay_frames(items, size, background, per_frame, scale):
+        encoder.put(frame)
+    encoder.finish()
+    return encoder.count
+
+
+def guess_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".gif":
+        return "gif"
+    if ext in (".png", ".apng"):
+        return "apng"
+    if path == "-" or ext == ".rgba":
+        return "raw"
+    return "png"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a session as a timelapse.")
+    parser.add_argument("session", help="session .json file")
+    parser.add_argument("out", help="output file, frame folder, or - for stdout")
+    parser.add_argument("-f", "--format", choices=["gif", "apng", "png", "raw"])
+    parser.add_argument("-p", "--page", type=int, default=1)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--per-frame", type=int, help="strokes added per frame")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("-b", "--background", choices=list(BACKGROUNDS))
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QGuiApplication.instance() or QGuiApplication([])
+
+    data = load_session(args.session)
+    items = replay_order(decode_page(data["pages"][args.page - 1]))
+    background = BACKGROUNDS.get(args.background) or BACKGROUNDS["black"]
+    fmt = args.format or guess_format(args.out)
+
+    start = time.perf_counter()
+    count = export(
+        items,
+        data["size"],
+        background,
+        args.out,
+        fmt,
+        args.fps,
+        args.per_frame,
+        args.scale,
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(items)} strokes, {count} frames in {elapsed:.2f}s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
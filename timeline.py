@@ -0,0 +1,218 @@
+# type: ignore
+"""
+歷史時間軸：畫面下方一排歷史紀錄的縮圖，點一下直接跳到那一筆。
+縮圖在背景執行緒從筆畫資料畫成小圖，依快照編號做 LRU 快取，只畫看得到的格子。
+背景執行緒只拿到筆畫的複本（寫到磁碟的快照也在背景讀），用自己的 QPen 快取，
+不會在 GUI 執行緒以外動到圖層上的筆畫或共用的快取。
+"""
+from PySide2.QtCore import QObject, QRectF, Qt, Signal
+from PySide2.QtGui import QColor, QImage, QPainter
+from PySide2.QtWidgets import QWidget
+from collections import OrderedDict
+import queue
+import threading
+
+from pages import LAYERS
+from strokes import draw_item, stroke_bounds
+from viewport import lod_tolerance
+import palette
+
+THUMB_WIDTH = 160
+THUMB_HEIGHT = 90
+GAP = 8
+CACHE_SIZE = 256  # 最多留幾張縮圖
+THUMB_BACKGROUND = QColor(0, 0, 0)
+PLACEHOLDER = QColor(40, 40, 40)
+
+
+def render_thumbnail(items, size, scale, dpr, pens):
+    """把筆畫縮小畫成一張圖（QImage 可以在背景執行緒畫），縮小時略過太小的筆畫。"""
+    w, h = size
+    img = QImage(round(w * dpr), round(h * dpr), QImage.Format_ARGB32_Premultiplied)
+    img.setDevicePixelRatio(dpr)
+    img.fill(THUMB_BACKGROUND)
+
+    p = QPainter(img)
+    p.setRenderHint(QPainter.Antialiasing)
+    p.scale(scale, scale)
+    lod = lod_tolerance(scale)
+    tiny = 0.5 / scale
+    for item in items:
+        if lod is not None:
+            bbox = stroke_bounds(item)
+            if bbox.width() < tiny and bbox.height() < tiny:
+                continue
+        draw_item(p, item, lod, pens)
+    p.end()
+    return img
+
+
+class ThumbnailRenderer(QObject):
+    """
+    一個背景執行緒依序畫縮圖，畫好由 rendered 送回 GUI 執行緒。
+    後排的先畫（最近捲到的格子），已經捲出畫面的就跳過。
+    """
+
+    rendered = Signal(object, object)  # (快照編號, QImage)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pens = {}  # 這個執行緒自己的 QPen 快取
+        self.jobs = queue.LifoQueue()
+        self.wanted = set()
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+
+    def request(self, key, load, size, scale, dpr):
+        """load() 在背景執行緒呼叫，回傳 {圖層: [筆畫]}。"""
+        self.wanted.add(key)
+        self.jobs.put((key, load, size, scale, dpr))
+
+    def run(self):
+        while True:
+            key, load, size, scale, dpr = self.jobs.get()
+            if key not in self.wanted:
+                continue
+            layers = load()
+            items = [s for name in LAYERS for s in layers.get(name, ())]
+            img = render_thumbnail(items, size, scale, dpr, self.pens)
+            self.rendered.emit(key, img)
+
+
+class Timeline(QWidget):
+    def __init__(self, parent, canva):
+        super().__init__(parent)
+        self.canva = canva
+        self.renderer = None
+        self.cache = OrderedDict()  # 快照編號 -> QImage
+        self.pending = set()
+        self.first = 0  # 最左邊那格是第幾筆
+        self.hide()
+
+        canva.scene.changed.connect(self.scene_changed)
+
+    def toggle(self):
+        if self.isVisible():
+            self.hide()
+            return
+
+        if self.renderer is None:
+            self.renderer = ThumbnailRenderer(self)
+            self.renderer.rendered.connect(self.thumbnail_ready)
+        self.place()
+        self.scroll_to_current()
+        self.show()
+        self.raise_()
+
+    def place(self):
+        parent = self.parentWidget()
+        height = THUMB_HEIGHT + GAP * 2
+        self.setGeometry(20, parent.height() - height - 20, parent.width() - 40, height)
+
+    def columns(self):
+        return max(1, (self.width() - GAP) // (THUMB_WIDTH + GAP))
+
+    def scroll_to_current(self):
+        i = self.canva.history_index
+        n = self.columns()
+        if i < self.first:
+            self.first = i
+        elif i >= self.first + n:
+            self.first = i - n + 1
+        self.first = max(0, min(self.first, len(self.canva.history) - n))
+
+    def scene_changed(self, aspect):
+        if not self.isVisible() or aspect not in ("history", "page"):
+            return
+        self.scroll_to_current()
+        self.update()
+
+    def cell(self, k):
+        return QRectF(GAP + k * (THUMB_WIDTH + GAP), GAP, THUMB_WIDTH, THUMB_HEIGHT)
+
+    def index_at(self, pos):
+        k = int((pos.x() - GAP) // (THUMB_WIDTH + GAP))
+        if k < 0 or not self.cell(k).contains(pos):
+            return None
+        i = self.first + k
+        return i if i < len(self.canva.history) else None
+
+    # ============================================================
+    #   Thumbnails
+    # ============================================================
+
+    def thumbnail(self, i):
+        """有快取就直接用；沒有的話交給背景執行緒，先回傳 None。"""
+        history = self.canva.history
+        key = history.serial(i)
+        img = self.cache.get(key)
+        if img is not None:
+            self.cache.move_to_end(key)
+            return img
+
+        if key not in self.pending:
+            self.pending.add(key)
+            load = history.detached(i)
+            canva = self.canva
+            scale = min(
+                THUMB_WIDTH / max(1, canva.width()),
+                THUMB_HEIGHT / max(1, canva.height()),
+            )
+            size = (THUMB_WIDTH, THUMB_HEIGHT)
+            self.renderer.request(key, load, size, scale, self.devicePixelRatioF())
+        return None
+
+    def thumbnail_ready(self, key, img):
+        self.pending.discard(key)
+        self.renderer.wanted.discard(key)
+        self.cache[key] = img
+        if len(self.cache) > CACHE_SIZE:
+            self.cache.popitem(last=False)
+        self.update()
+
+    # ============================================================
+    #   Events
+    # ============================================================
+
+    def paintEvent(self, event):
+        p = QPainter(self)
+        p.setRenderHint(QPainter.Antialiasing)
+        p.setPen(Qt.NoPen)
+        p.setBrush(QColor(51, 51, 51))
+        p.drawRoundedRect(QRectF(self.rect()), 12, 12)
+
+        history = self.canva.history
+        last = min(len(history), self.first + self.columns())
+        visible = {history.serial(i) for i in range(self.first, last)}
+        if self.renderer is not None:
+            # 捲出畫面的縮圖不用畫了
+            self.renderer.wanted &= visible
+            self.pending &= visible
+
+        for i in range(self.first, last):
+            rect = self.cell(i - self.first)
+            img = self.thumbnail(i)
+            if img is None:
+                p.fillRect(rect, PLACEHOLDER)
+            else:
+                p.drawImage(rect, img)
+
+            p.setBrush(Qt.NoBrush)
+            if i == self.canva.history_index:
+                p.setPen(palette.pen(palette.ACCENT, 2))
+            else:
+                p.setPen(palette.pen(QColor(102, 102, 102), 1))
+            p.drawRect(rect)
+            p.setPen(Qt.NoPen)
+
+    def mousePressEvent(self, event):
+        i = self.index_at(event.pos())
+        if i is not None:
+            self.canva.jump_to(i)
+
+    def wheelEvent(self, event):
+        step = -1 if event.angleDelta().y() > 0 else 1
+        n = self.columns()
+        self.first = max(0, min(self.first + step, len(self.canva.history) - n))
+        self.update()
+        event.accept()
@@ -1,91 +1,53 @@
 # type: ignore
-from PySide2.QtCore import Qt, QSize, QPoint
-from PySide2.QtGui import QColor, QPainter, QPen, QIcon
+from PySide2.QtCore import QSize
+from PySide2.QtGui import QPainter
 from PySide2.QtWidgets import QPushButton, QFrame, QHBoxLayout, QMenu
-import os
 
 from canva import Canva
-
-
-def get_icon(path: str):
-    base = os.path.dirname(os.path.abspath(__file__))
-    full = os.path.join(base, "image", "toolbar", path)
-    return QIcon(full)
+from glyphs import BUTTON_SIZE, get_icon, size_glyph, shape_glyph, color_glyph
 
 
 class SizeButton(QPushButton):
     def __init__(self, canvas: Canva, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.canvas = canvas
-        self.setFixedSize(52, 52)
+        self.setFixedSize(BUTTON_SIZE, BUTTON_SIZE)
 
     def paintEvent(self, event):
         super().paintEvent(event)
 
+        dpr = self.devicePixelRatioF()
         p = QPainter(self)
-        p.setRenderHint(QPainter.Antialiasing)
-        p.setPen(QPen(QColor(255, 255, 255), 3))
-        p.setBrush(Qt.NoBrush)
-
-        cx = self.width() // 2
-        cy = self.height() // 2
-        r = min(18, self.canvas.thickness / 2)
-        p.drawEllipse(QPoint(cx, cy), r, r)
+        p.drawPixmap(0, 0, size_glyph(self.canvas.thickness, dpr))
 
 
 class ShapeButton(QPushButton):
     def __init__(self, canvas: Canva, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.canvas = canvas
-        self.setFixedSize(52, 52)
+        self.setFixedSize(BUTTON_SIZE, BUTTON_SIZE)
 
     def paintEvent(self, event):
         super().paintEvent(event)
 
+        dpr = self.devicePixelRatioF()
         p = QPainter(self)
-        p.setRenderHint(QPainter.Antialiasing)
-        p.setPen(QPen(QColor(255, 255, 255), 3))
-
-        cx = self.width() // 2
-        cy = self.height() // 2
-
-        shape = self.canvas.shape
-        if shape == "free":
-            font = p.font()
-            font.setFamily("Microsoft JhengHei")
-            font.setPointSize(24)
-
-            p.setFont(font)
-            p.drawText(self.rect(), Qt.AlignCenter, "S")
-
-        elif shape == "line":
-            p.drawLine(cx - 12, cy - 12, cx + 12, cy + 12)
-
-        elif shape == "rect":
-            p.drawRect(cx - 12, cy - 12, 24, 24)
+        p.drawPixmap(0, 0, shape_glyph(self.canvas.shape, dpr))
 
 
 class ColorButton(QPushButton):
     def __init__(self, canvas: Canva, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.canvas = canvas
-        self.setFixedSize(52, 52)
+        self.setFixedSize(BUTTON_SIZE, BUTTON_SIZE)
 
     def paintEvent(self, event):
         super().paintEvent(event)
 
+        c = self.canvas.pen_color
+        dpr = self.devicePixelRatioF()
         p = QPainter(self)
-        p.setRenderHint(QPainter.Antialiasing)
-        p.setPen(QPen(QColor(255, 255, 255), 3))
-
-        r = self.canvas.pen_color.red()
-        g = self.canvas.pen_color.green()
-        b = self.canvas.pen_color.blue()
-        p.setBrush(QColor(r, g, b))
-
-        x = (self.width()) // 2
-        y = (self.height()) // 2
-        p.drawRoundedRect(x - 13, y - 13, 26, 26, 8, 8)
+        p.drawPixmap(0, 0, color_glyph((c.red(), c.green(), c.blue()), dpr))
 
 
 class Toolbar(QFrame):
@@ -137,9 +99,10 @@ class Toolbar(QFrame):
 
         def icon_btn(path, scale=0.8):
             btn = QPushButton()
-            btn.setFixedSize(52, 52)
+            btn.setFixedSize(BUTTON_SIZE, BUTTON_SIZE)
             btn.setIcon(get_icon(path))
-            btn.setIconSize(QSize(int(52 * scale), int(52 * scale)))
+            size = int(BUTTON_SIZE * scale)
+            btn.setIconSize(QSize(size, size))
             layout.addWidget(btn)
             return btn
 
@@ -148,14 +111,16 @@ class Toolbar(QFrame):
         btn_board.clicked.connect(window.toggle_board)
 
         # tool
-        btn_tool = icon_btn(f"tools/{self.canva.tool}.svg")
+        self.btn_tool = btn_tool = icon_btn(f"tools/{self.canva.tool}.svg")
         tool_menu = QMenu(self)
-        tool_menu.addAction("🖊️ pen", lambda: self.canva.set_tool("free"))
+        tool_menu.addAction("🖊️ pen", lambda: self.canva.set_tool("pen"))
         tool_menu.addAction("🖍️ highlight", lambda: self.canva.set_tool("highlight"))
         tool_menu.addAction(" █  eraser", lambda: self.canva.set_tool("eraser"))
         tool_menu.addAction(
             "［ ］ crop eraser", lambda: self.canva.set_tool("crop_eraser")
         )
+        tool_menu.addAction("🔴 laser", lambda: self.canva.set_tool("laser"))
+        tool_menu.addAction("⬚  select", lambda: self.canva.set_tool("select"))
         btn_tool.setMenu(tool_menu)
 
         # size
@@ -165,7 +130,7 @@ class Toolbar(QFrame):
         for s in [4, 6, 10, 14, 20, 30, 50]:
             size_menu.addAction(
                 f"{s}px",
-                lambda v=s: (self.canva.set_size(v), self.btn_size.update()),
+                lambda v=s: self.canva.set_size(v),
             )
         self.btn_size.setMenu(size_menu)
 
@@ -194,7 +159,7 @@ class Toolbar(QFrame):
         for name, color in colors.items():
             color_menu.addAction(
                 name,
-                lambda c=color: (self.canva.set_color(c), self.btn_color.update()),
+                lambda c=color: self.canva.set_color(c),
             )
         self.btn_color.setMenu(color_menu)
 
@@ -222,3 +187,16 @@ class Toolbar(QFrame):
         # close
         btn_close = icon_btn("close.svg")
         btn_close.clicked.connect(window.closeEvent)
+
+        canva.scene.changed.connect(self.scene_changed)
+
+    def scene_changed(self, aspect):
+        """只重畫狀態真的變了的按鈕。"""
+        if aspect == "tool":
+            self.btn_tool.setIcon(get_icon(f"tools/{self.canva.tool}.svg"))
+        elif aspect == "size":
+            self.btn_size.update()
+        elif aspect == "shape":
+            self.btn_shape.update()
+        elif aspect == "color":
+            self.btn_color.update()
@@ -0,0 +1,763 @@
+# type: ignore
+from PySide2.QtCore import Qt, QPointF, QRectF, QTimer
+from PySide2.QtGui import QImage, QPainter, QPolygonF
+import math
+import time
+
+from geometry import around, dist, points_rect
+from ink import InkWidth, OutlineBuilder
+from recognize import recognize
+from smoothing import OneEuroFilter, SplineBuilder
+from strokes import (
+    draw_item,
+    stroke_bounds,
+    stroke_hit,
+    stroke_intersects,
+    transform_stroke,
+)
+import palette
+
+TOOLS = {}
+
+LASER_FADE = 1.0  # 秒，雷射筆的軌跡多久後消失
+LASER_POINTS = 512  # 軌跡最多留幾個點
+LASER_FRAME = 16  # ms
+HANDLE = 10  # px，選取框右下角縮放把手的大小
+MAX_SPRITE = 4096  # px，選取內容的快取圖最大邊長
+
+
+def register_tool(cls):
+    """註冊工具，Canva 會為每個註冊的工具建立一個實例。"""
+    TOOLS[cls.name] = cls
+    return cls
+
+
+class BaseTool:
+    """
+    工具引擎的基底類別。
+    每個工具自己處理 press / move / release 與預覽，
+    事件方法回傳需要重繪的範圍（QRectF），None 表示不用重繪。
+    """
+
+    name = "base"
+    default_size = 4
+    default_color = "white"
+    shape = "free"
+    cursor = Qt.CrossCursor
+
+    def __init__(self):
+        self.size = self.default_size
+        self.color = self.default_color  # 儲存字串
+        self.shape = self.shape
+
+    def get_qcolor(self):
+        if self.color is None:
+            return None
+        return palette.qcolor(self.color)
+
+    def state(self):
+        return {"size": self.size, "shape": self.shape, "color": self.color}
+
+    def load(self, state):
+        self.size = state["size"]
+        self.shape = state["shape"]
+        self.color = state["color"]
+
+    def press(self, canva, pos):
+        return None
+
+    def move(self, canva, pos):
+        return None
+
+    def release(self, canva, pos):
+        return None
+
+    def cancel(self, canva):
+        return None
+
+    def recolor(self, canva, color):
+        """選了新顏色；會改既有筆畫的工具回傳需要重繪的範圍。"""
+        return None
+
+    def draw_preview(self, canva, painter):
+        pass
+
+
+class DrawTool(BaseTool):
+    """自由筆、直線、矩形共用的繪圖流程。"""
+
+    def __init__(self):
+        super().__init__()
+        self.start_pos = None
+        self.last_pos = None
+        self.points = []
+        self.filter = OneEuroFilter()
+        self.spline = None  # 平滑模式下邊畫邊建的曲線
+        self.ink = InkWidth()
+        self.widths = []
+        self.outline = None  # 粗細會變時邊畫邊建的外框
+
+    def build(self, canva, points):
+        base = {
+            "color": canva.pen_color,
+            "width": canva.thickness,
+            "tool": self.name,
+        }
+
+        if canva.shape == "free":
+            if len(points) < 2:
+                return None
+            if self.outline is not None:
+                base["widths"] = self.widths[: len(points)]
+            elif self.spline is not None:
+                base["smooth"] = True
+            return {"type": "pen", "points": points, **base}
+
+        elif canva.shape == "line":
+            return {
+                "type": "line",
+                "start": self.start_pos,
+                "end": self.last_pos,
+                **base,
+            }
+
+        elif canva.shape == "rect":
+            rect = QRectF(self.start_pos, self.last_pos).normalized()
+            return {"type": "rect", "rect": rect, **base}
+
+        return None
+
+    def preview_bounds(self, canva):
+        pad = canva.thickness / 2 + 2
+        return points_rect([self.start_pos, self.last_pos], pad)
+
+    def press(self, canva, pos):
+        self.start_pos = pos
+        self.last_pos = pos
+        self.points = [pos]
+
+        if canva.shape == "free" and canva.smoothing:
+            self.filter.reset()
+            self.spline = SplineBuilder()
+            self.spline.add(self.filter(pos, time.perf_counter()))
+
+        if canva.shape == "free" and canva.variable_width:
+            self.ink.reset()
+            self.outline = OutlineBuilder()
+            self.add_width(canva, pos)
+        return around(pos, canva.thickness)
+
+    def add_width(self, canva, pos):
+        w = self.ink(canva.thickness, pos, time.perf_counter(), canva.pressure)
+        self.widths.append(w)
+        self.outline.add(pos, w)
+
+    def move(self, canva, pos):
+        if self.start_pos is None:
+            return None
+
+        if canva.shape == "free":
+            if self.spline is not None:
+                pos = self.filter(pos, time.perf_counter())
+                self.spline.add(pos)
+            if self.outline is not None:
+                self.add_width(canva, pos)
+            # 只重繪最新的一段（曲線會動到前兩個點之間）
+            self.points.append(pos)
+            return points_rect(self.points[-4:], canva.thickness / 2 + 2)
+
+        old = self.preview_bounds(canva)
+        self.last_pos = pos
+        return old.united(self.preview_bounds(canva))
+
+    def release(self, canva, pos):
+        if self.start_pos is None:
+            return None
+
+        damage = self.preview_bounds(canva)
+        if self.spline is not None and pos != self.points[-1]:
+            # 濾波會落後一點，收筆時補上真正的終點
+            self.points.append(QPointF(pos))
+            self.spline.add(pos)
+            if self.outline is not None:
+                self.add_width(canva, pos)
+        item = self.build(canva, self.points[:])
+        if item is not None and item["type"] == "pen" and canva.recognize:
+            item = recognize(item)
+        if item is not None:
+            if item.get("smooth"):
+                item["path"] = self.spline.finish()
+            canva.add_stroke(item)
+            damage = damage.united(stroke_bounds(item))
+
+        self.cancel(canva)
+        canva.add_history_snapshot()
+        return damage
+
+    def cancel(self, canva):
+        self.start_pos = None
+        self.last_pos = None
+        self.points = []
+        self.spline = None
+        self.widths = []
+        self.outline = None
+
+    def draw_preview(self, canva, painter):
+        if self.start_pos is None:
+            return
+
+        if self.outline is not None:
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(canva.pen_color)
+            painter.drawPolygon(self.outline.polygon(), Qt.WindingFill)
+            return
+
+        if self.spline is not None:
+            painter.setPen(palette.pen(canva.pen_color, canva.thickness, self.name))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawPath(self.spline.path)
+            tail = self.spline.tail()
+            if tail is not None:
+                painter.drawLine(*tail)
+            return
+
+        item = self.build(canva, self.points)
+        if item is not None:
+            draw_item(painter, item)
+
+
+@register_tool
+class PenTool(DrawTool):
+    name = "pen"
+    default_size = 4
+    default_color = "white"
+    shape = "free"
+
+
+@register_tool
+class HighlightTool(DrawTool):
+    name = "highlight"
+    default_size = 12
+    default_color = "yellow"
+    shape = "free"
+
+
+@register_tool
+class EraserTool(BaseTool):
+    name = "eraser"
+    default_size = 30
+    default_color = None
+    shape = "free"
+    cursor = Qt.BlankCursor
+
+    def __init__(self):
+        super().__init__()
+        self.last_pos = None
+        self.erased = False
+
+    def erase(self, canva, a, b):
+        """沿著 a→b 取樣，只檢查空間索引查到的附近筆畫。"""
+        r = canva.thickness / 2
+        steps = max(1, int(dist(a, b) / max(1, r / 2)))
+        samples = [a + (b - a) * (i / steps) for i in range(steps + 1)]
+
+        area = points_rect([a, b], r)
+        hits = [
+            s for s in canva.query(area) if any(stroke_hit(s, p, r) for p in samples)
+        ]
+        if not hits:
+            return QRectF()
+
+        self.erased = True
+        return canva.remove_strokes(hits)
+
+    # 橡皮擦的圈是游標（cursors.py），這裡不用畫預覽
+
+    def press(self, canva, pos):
+        self.erased = False
+        self.last_pos = pos
+        return self.erase(canva, pos, pos)
+
+    def move(self, canva, pos):
+        if self.last_pos is None:
+            return None
+
+        damage = self.erase(canva, self.last_pos, pos)
+        self.last_pos = pos
+        return damage
+
+    def release(self, canva, pos):
+        if self.erased:
+            canva.add_history_snapshot()
+        self.last_pos = None
+        self.erased = False
+        return None
+
+    def cancel(self, canva):
+        self.last_pos = None
+
+
+@register_tool
+class CropEraserTool(BaseTool):
+    name = "crop_eraser"
+    default_size = 40
+    default_color = None
+    shape = "rect"
+
+    def __init__(self):
+        super().__init__()
+        self.start_pos = None
+        self.last_pos = None
+
+    def area(self):
+        return QRectF(self.start_pos, self.last_pos).normalized()
+
+    def press(self, canva, pos):
+        self.start_pos = pos
+        self.last_pos = pos
+        return around(pos, 4)
+
+    def move(self, canva, pos):
+        if self.start_pos is None:
+            return None
+
+        old = self.area()
+        self.last_pos = pos
+        return old.united(self.area()).adjusted(-2, -2, 2, 2)
+
+    def release(self, canva, pos):
+        if self.start_pos is None:
+            return None
+
+        area = self.area()
+        damage = area.adjusted(-2, -2, 2, 2)
+        hits = [s for s in canva.query(area) if stroke_intersects(s, area)]
+        if hits:
+            damage = damage.united(canva.remove_strokes(hits))
+            canva.add_history_snapshot()
+
+        self.cancel(canva)
+        return damage
+
+    def cancel(self, canva):
+        self.start_pos = None
+        self.last_pos = None
+
+    def draw_preview(self, canva, painter):
+        if self.start_pos is None:
+            return
+
+        painter.setPen(palette.pen(palette.ACCENT, 2, style=Qt.DashLine))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRect(self.area())
+
+
+class TrailBuffer:
+    """固定大小的環狀緩衝區：點、時間與是否接續上一點，滿了就蓋掉最舊的。"""
+
+    def __init__(self, capacity=LASER_POINTS):
+        self.capacity = capacity
+        self.xs = [0.0] * capacity
+        self.ys = [0.0] * capacity
+        self.times = [0.0] * capacity
+        self.joined = [False] * capacity
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, pos, t, joined):
+        i = (self.start + self.count) % self.capacity
+        self.xs[i] = pos.x()
+        self.ys[i] = pos.y()
+        self.times[i] = t
+        self.joined[i] = joined
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def expire(self, before):
+        """丟掉 before 之前的點（最舊的在前面，只要從頭丟）。"""
+        while self.count and self.times[self.start] < before:
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+        if self.count:
+            self.joined[self.start] = False
+
+    def clear(self):
+        self.start = 0
+        self.count = 0
+
+    def last(self):
+        i = (self.start + self.count - 1) % self.capacity
+        return QPointF(self.xs[i], self.ys[i])
+
+    def indexes(self):
+        return [(self.start + k) % self.capacity for k in range(self.count)]
+
+    def bounds(self, pad):
+        if not self.count:
+            return None
+        idx = self.indexes()
+        xs = [self.xs[i] for i in idx]
+        ys = [self.ys[i] for i in idx]
+        return QRectF(
+            min(xs) - pad,
+            min(ys) - pad,
+            max(xs) - min(xs) + pad * 2,
+            max(ys) - min(ys) + pad * 2,
+        )
+
+
+@register_tool
+class LaserTool(BaseTool):
+    """
+    簡報用的雷射筆：軌跡慢慢淡掉，不會變成筆畫，也不進歷史紀錄。
+    淡出由每幀的計時器推動，只重畫軌跡的範圍；軌跡消失後計時器就停下。
+    """
+
+    name = "laser"
+    default_size = 8
+    default_color = "red"
+    shape = "free"
+
+    def __init__(self):
+        super().__init__()
+        self.trail = TrailBuffer()
+        self.fade = LASER_FADE
+        self.drawing = False
+        self.canva = None
+        self.timer = None
+
+    def press(self, canva, pos):
+        if self.timer is None:
+            self.canva = canva
+            self.timer = QTimer(canva)
+            self.timer.setInterval(LASER_FRAME)
+            self.timer.timeout.connect(self.tick)
+
+        self.drawing = True
+        self.trail.append(pos, time.perf_counter(), False)
+        self.timer.start()
+        return around(pos, canva.thickness)
+
+    def move(self, canva, pos):
+        if not self.drawing:
+            return None
+        last = self.trail.last()
+        self.trail.append(pos, time.perf_counter(), True)
+        return points_rect([last, pos], canva.thickness)
+
+    def release(self, canva, pos):
+        self.drawing = False
+        return None
+
+    def cancel(self, canva):
+        damage = self.trail.bounds(canva.thickness)
+        self.drawing = False
+        self.trail.clear()
+        if self.timer is not None:
+            self.timer.stop()
+        return damage
+
+    def tick(self):
+        """淡出一幀：重畫整條軌跡的範圍（每個點的透明度都變了），沒有點了就停。"""
+        pad = self.canva.thickness
+        damage = self.trail.bounds(pad)
+        self.trail.expire(time.perf_counter() - self.fade)
+        if not self.trail and not self.drawing:
+            self.timer.stop()
+        self.canva.repaint_damage(damage)
+
+    def draw_preview(self, canva, painter):
+        trail = self.trail
+        if not trail:
+            return
+
+        now = time.perf_counter()
+        color = canva.pen_color
+        width = canva.thickness
+        painter.setBrush(Qt.NoBrush)
+
+        idx = trail.indexes()
+        for k in range(1, len(idx)):
+            i, j = idx[k - 1], idx[k]
+            if not trail.joined[j]:
+                continue
+            # 透明度和粗細都由同樣的 16 級算出，共用的 QPen 不會無限增加
+            life = 1 - (now - trail.times[j]) / self.fade
+            level = max(0, min(15, int(life * 16)))
+            if level == 0:
+                continue
+            c = palette.rgba_color(color.red(), color.green(), color.blue(), level * 17)
+            painter.setPen(palette.pen(c, max(1, width * (0.4 + 0.6 * level / 15))))
+            painter.drawLine(
+                QPointF(trail.xs[i], trail.ys[i]), QPointF(trail.xs[j], trail.ys[j])
+            )
+
+        # 按著時在最新的點畫一顆亮點
+        if self.drawing:
+            last = idx[-1]
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(color)
+            painter.drawEllipse(
+                QPointF(trail.xs[last], trail.ys[last]), width / 2, width / 2
+            )
+
+
+@register_tool
+class SelectTool(BaseTool):
+    """
+    框選（rect）或套索（free）選取既有筆畫，拖曳移動、拖右下角縮放、選顏色換色。
+    拖曳時原本的筆畫先從圖層拿掉，只畫一張選取內容的快取圖，
+    放開才把新的幾何寫回筆畫，整個動作只算一筆歷史紀錄。
+    """
+
+    name = "select"
+    default_size = 4
+    default_color = None
+    shape = "rect"
+
+    def __init__(self):
+        super().__init__()
+        self.selection = []
+        self.bounds = QRectF()
+        self.sprite = None
+        self.sprite_scale = None
+        self.lasso = []  # 正在畫的選取範圍
+        self.mode = None  # "lasso" / "move" / "scale"
+        self.start_pos = None
+        self.offset = QPointF()
+        self.scale = 1.0
+        self.lifted = False  # 原本的筆畫是不是已經從圖層拿掉
+        self.positions = []  # 拿掉前各筆畫在圖層裡的位置，放回時保持繪製順序
+
+    # ============================================================
+    #   Selection
+    # ============================================================
+
+    def select(self, canva):
+        pts = self.lasso
+        if len(pts) < 2:
+            self.clear()
+            return
+        area = points_rect(pts)
+
+        if canva.shape == "free":
+            poly = QPolygonF(pts)
+            hits = [
+                s
+                for s in canva.query(area)
+                if poly.containsPoint(stroke_bounds(s).center(), Qt.OddEvenFill)
+            ]
+        else:
+            area = QRectF(pts[0], pts[-1]).normalized()
+            hits = [s for s in canva.query(area) if area.contains(stroke_bounds(s))]
+
+        # 依圖層與繪製順序排好，快取圖的疊法和畫面一樣
+        ids = {id(s) for s in hits}
+        self.set_selection(canva, [s for s in canva.strokes if id(s) in ids])
+
+    def set_selection(self, canva, items):
+        self.selection = items
+        self.sprite = None
+        self.bounds = QRectF()
+        for item in items:
+            self.bounds = self.bounds.united(stroke_bounds(item))
+
+    def clear(self):
+        self.selection = []
+        self.bounds = QRectF()
+        self.sprite = None
+
+    def handle_rect(self, canva):
+        size = HANDLE / canva.view().scale
+        corner = self.bounds.bottomRight()
+        return QRectF(corner.x() - size / 2, corner.y() - size / 2, size, size)
+
+    def target(self):
+        """選取內容目前（拖曳 / 縮放中）的位置。"""
+        b = self.bounds
+        return QRectF(
+            b.x() + self.offset.x(),
+            b.y() + self.offset.y(),
+            b.width() * self.scale,
+            b.height() * self.scale,
+        )
+
+    def damage(self, canva):
+        pad = HANDLE / canva.view().scale + 2
+        return self.target().adjusted(-pad, -pad, pad, pad)
+
+    def render_sprite(self, canva):
+        """選取的筆畫畫成一張圖，依目前的縮放與 DPR 只畫一次。"""
+        scale = canva.view().scale * canva.devicePixelRatioF()
+        b = self.bounds
+        scale = min(scale, MAX_SPRITE / max(1, b.width(), b.height()))
+        if self.sprite is not None and self.sprite_scale == scale:
+            return self.sprite
+
+        img = QImage(
+            max(1, math.ceil(b.width() * scale)),
+            max(1, math.ceil(b.height() * scale)),
+            QImage.Format_ARGB32_Premultiplied,
+        )
+        img.fill(Qt.transparent)
+        p = QPainter(img)
+        p.setRenderHint(QPainter.Antialiasing)
+        p.scale(scale, scale)
+        p.translate(-b.topLeft())
+        for item in self.selection:
+            draw_item(p, item)
+        p.end()
+
+        self.sprite = img
+        self.sprite_scale = scale
+        return img
+
+    def lift(self, canva):
+        """開始拖曳：原本的筆畫先從圖層拿掉，分塊快取只需要重畫一次。"""
+        if not self.lifted:
+            self.render_sprite(canva)
+            self.positions = canva.stroke_positions(self.selection)
+            canva.remove_strokes(self.selection)
+            self.lifted = True
+
+    def commit(self, canva):
+        """放開：把位移與縮放寫進新的筆畫，換掉原本的。"""
+        origin = self.bounds.topLeft()
+        moved = [
+            transform_stroke(s, self.offset, self.scale, origin) for s in self.selection
+        ]
+        canva.insert_strokes(moved, self.positions)
+        self.lifted = False
+        self.offset = QPointF()
+        self.scale = 1.0
+        self.set_selection(canva, moved)
+        canva.add_history_snapshot()
+
+    # ============================================================
+    #   Events
+    # ============================================================
+
+    def press(self, canva, pos):
+        pos = QPointF(pos)
+        self.start_pos = pos
+        if self.selection:
+            # 選取之後被復原或擦掉的筆畫就不算了
+            alive = {id(s) for s in canva.strokes}
+            if any(id(s) not in alive for s in self.selection):
+                self.set_selection(canva, [s for s in self.selection if id(s) in alive])
+
+        if self.selection and self.handle_rect(canva).contains(pos):
+            self.mode = "scale"
+            return None
+        if self.selection and self.bounds.contains(pos):
+            self.mode = "move"
+            return None
+
+        damage = self.damage(canva) if self.selection else None
+        self.clear()
+        self.mode = "lasso"
+        self.lasso = [pos]
+        return damage
+
+    def move(self, canva, pos):
+        pos = QPointF(pos)
+        if self.mode == "lasso":
+            old = points_rect(self.lasso, 2)
+            self.lasso.append(pos)
+            return old.united(points_rect(self.lasso, 2))
+
+        if self.mode not in ("move", "scale"):
+            return None
+
+        old = self.damage(canva)
+        self.lift(canva)
+        if self.mode == "move":
+            self.offset = pos - self.start_pos
+        else:
+            # 沿著對角線投影，等比例縮放，左上角固定
+            b = self.bounds
+            d = QPointF(b.width(), b.height())
+            v = pos - b.topLeft()
+            length = d.x() * d.x() + d.y() * d.y()
+            if length > 0:
+                self.scale = max(0.05, (v.x() * d.x() + v.y() * d.y()) / length)
+        return old.united(self.damage(canva))
+
+    def release(self, canva, pos):
+        mode = self.mode
+        self.mode = None
+
+        if mode == "lasso":
+            damage = points_rect(self.lasso, 2)
+            self.select(canva)
+            self.lasso = []
+            if self.selection:
+                damage = damage.united(self.damage(canva))
+            return damage
+
+        if mode in ("move", "scale") and self.lifted:
+            damage = self.damage(canva)
+            self.commit(canva)
+            return damage.united(self.damage(canva))
+        return None
+
+    def recolor(self, canva, color):
+        if not self.selection or self.mode is not None:
+            return None
+        items = []
+        for s in self.selection:
+            item = transform_stroke(s, QPointF())
+            item["color"] = palette.qcolor(color)
+            items.append(item)
+
+        positions = canva.stroke_positions(self.selection)
+        canva.remove_strokes(self.selection)
+        canva.insert_strokes(items, positions)
+        self.set_selection(canva, items)
+        canva.add_history_snapshot()
+        return self.damage(canva)
+
+    def cancel(self, canva):
+        """拖到一半被打斷（換工具、復原）：原本的筆畫放回去，不留歷史紀錄。"""
+        damage = self.damage(canva) if self.selection else None
+        if self.lifted:
+            canva.insert_strokes(self.selection, self.positions)
+            self.lifted = False
+        self.offset = QPointF()
+        self.scale = 1.0
+        self.mode = None
+        self.lasso = []
+        self.clear()
+        return damage
+
+    def draw_preview(self, canva, painter):
+        if self.lasso:
+            painter.setPen(palette.pen(palette.ACCENT, 1, style=Qt.DashLine))
+            painter.setBrush(Qt.NoBrush)
+            if canva.shape == "free":
+                painter.drawPolygon(QPolygonF(self.lasso))
+            else:
+                painter.drawRect(QRectF(self.lasso[0], self.lasso[-1]).normalized())
+            return
+
+        if not self.selection:
+            return
+
+        target = self.target()
+        if self.lifted:
+            painter.drawImage(target, self.render_sprite(canva))
+
+        painter.setPen(palette.pen(palette.ACCENT, 1, style=Qt.DashLine))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRect(target)
+
+        handle = self.handle_rect(canva)
+        handle.moveCenter(target.bottomRight())
+        painter.setPen(palette.pen(palette.ACCENT, 1))
+        painter.setBrush(palette.ACCENT)
+        painter.drawRect(handle)
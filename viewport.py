@@ -0,0 +1,61 @@
+# type: ignore
+from PySide2.QtCore import QPointF
+from PySide2.QtGui import QTransform
+
+MIN_SCALE = 0.05
+MAX_SCALE = 20.0
+
+
+class Viewport:
+    """黑板模式的平移 / 縮放：畫面座標 = 場景座標 * scale + offset。"""
+
+    def __init__(self):
+        self.scale = 1.0
+        self.offset = QPointF(0, 0)
+
+    def reset(self):
+        self.scale = 1.0
+        self.offset = QPointF(0, 0)
+
+    def is_identity(self):
+        return self.scale == 1.0 and self.offset.isNull()
+
+    def transform(self):
+        return QTransform(
+            self.scale, 0, 0, self.scale, self.offset.x(), self.offset.y()
+        )
+
+    def to_scene(self, pos):
+        if self.is_identity():
+            return pos
+        return (QPointF(pos) - self.offset) / self.scale
+
+    def map_rect(self, rect):
+        """場景範圍 → 畫面範圍"""
+        if self.is_identity():
+            return rect
+        return self.transform().mapRect(rect)
+
+    def pan(self, delta):
+        self.offset += QPointF(delta)
+
+    def zoom_at(self, pos, factor):
+        """以畫面上的 pos 為中心縮放，游標下的內容保持不動。"""
+        scale = max(MIN_SCALE, min(MAX_SCALE, self.scale * factor))
+        anchor = QPointF(pos)
+        scene = (anchor - self.offset) / self.scale
+        self.scale = scale
+        self.offset = anchor - scene * scale
+
+
+def lod_tolerance(scale):
+    """縮小時的簡化容許誤差（場景像素，取 2 的次方以便快取）。"""
+    if scale >= 0.5:
+        return None
+    tol = 1
+    while tol * scale < 1:
+        tol *= 2
+    return tol
+
+
+IDENTITY = Viewport()
@@ -1,18 +1,36 @@
 # type: ignore
-from PySide2.QtCore import Qt
-from PySide2.QtGui import QCursor, QKeySequence
-from PySide2.QtWidgets import QWidget, QApplication, QShortcut
+from PySide2.QtCore import Qt, QUrl
+from PySide2.QtGui import (
+    QCursor,
+    QDesktopServices,
+    QImage,
+    QKeySequence,
+    QPainter,
+)
+from PySide2.QtWidgets import QWidget, QApplication, QFileDialog, QShortcut
 from mss import mss
 from mss.tools import to_png
 import os
+import time
 
+import palette
 from canva import Canva
+from hotkey import GlobalHotkey, ModifierHotkey
+from idle import IdleScheduler
+from importer import Importer
+from magnifier import Magnifier
+from session import save_session
+from templates import next_template
+from timeline import Timeline
 from toolbar import Toolbar
 
+HIDE_DELAY = 0.05  # 秒，等視窗管理器真的把視窗藏起來再截圖
+
 
 class Window(QWidget):
-    def __init__(self):
+    def __init__(self, resident=False):
         super().__init__()
+        self.resident = resident
         self.tool_index = 0
         self.shape_index = 0
         self.color_index = 0
@@ -23,8 +41,22 @@ class Window(QWidget):
         self.canva = Canva(self)
         self.toolbar = Toolbar(self, self.canva)
         self.toolbar.raise_()
+        self.magnifier = Magnifier(self)
+        self.timeline = Timeline(self, self.canva)
+
+        self.canva.drawing_mode_changed.connect(
+            lambda on: self.set_pass_through(not on)
+        )
+        self.hotkey = GlobalHotkey(parent=self)
+        self.hotkey.activated.connect(self.toggle_drawing)
+        self.fallback_hotkey = ModifierHotkey(self)
+        self.fallback_hotkey.activated.connect(self.toggle_drawing)
+        QApplication.instance().aboutToQuit.connect(self.hotkey.stop)
+        self.idle = IdleScheduler(self.canva, parent=self)
+        self.importer = Importer(self)
+        self.importer.loaded.connect(self.canva.import_strokes)
+        self.importer.failed.connect(lambda msg: print(f"Error: {msg}"))
 
-        self.showFullScreen()
         self.build_shortcuts()
 
     def resizeEvent(self, event):
@@ -32,12 +64,14 @@ class Window(QWidget):
         self.toolbar.adjustSize()
         tw = self.toolbar.width()
         self.toolbar.move((self.width() - tw) // 2, 10)
+        self.timeline.place()
 
     def build_shortcuts(self):
         def shortcut(key, func):
             QShortcut(QKeySequence(key), self, activated=func)
 
         shortcut("W", lambda: self.toggle_board())
+        shortcut("SHIFT+W", lambda: self.cycle_template())
         shortcut("E", lambda: self.toggle_eraser())
         shortcut("D", lambda: self.set_lasttool())
         shortcut("Q", lambda: self.toggle_tool())
@@ -55,38 +89,69 @@ class Window(QWidget):
         shortcut("T", lambda: self.set_pen(color="gray"))
         shortcut("G", lambda: self.set_pen(color="white"))
         shortcut("B", lambda: self.set_pen(color="white"))
+        shortcut("N", lambda: self.canva.toggle_smoothing())
+        shortcut("P", lambda: self.canva.toggle_variable_width())
+        shortcut("K", lambda: self.canva.toggle_recognize())
+        shortcut("M", lambda: self.magnifier.toggle())
+        shortcut("L", lambda: self.canva.set_tool("laser"))
+        shortcut("H", lambda: self.timeline.toggle())
+        shortcut("U", lambda: self.canva.set_tool("select"))
         shortcut("X", lambda: self.canva.clear())
         shortcut("A", lambda: self.canva.undo())
         shortcut("Z", lambda: self.canva.redo())
         shortcut("Ctrl+Z", lambda: self.canva.undo())
         shortcut("Ctrl+Y", lambda: self.canva.redo())
         shortcut("Ctrl+S", lambda: self.save())
+        shortcut("Ctrl+Shift+S", lambda: self.save_session())
+        shortcut("Ctrl+O", lambda: self.import_file())
+        shortcut("Ctrl+C", lambda: self.copy())
+        shortcut("Ctrl+Shift+C", lambda: self.copy(over_screen=True))
         shortcut("Ctrl+R", lambda: self.closeEvent())
+        shortcut("Ctrl+0", lambda: self.canva.reset_view())
+        shortcut("PgDown", lambda: self.canva.next_page())
+        shortcut("PgUp", lambda: self.canva.prev_page())
+        shortcut("Ctrl+N", lambda: self.canva.new_page())
+        shortcut("Ctrl+L", lambda: self.canva.toggle_background_lock())
         shortcut("Esc", lambda: self.closeEvent())
 
     def wheelEvent(self, event):
         delta = event.angleDelta().y()
+
+        if self.canva.board_mode() and event.modifiers() & Qt.ControlModifier:
+            factor = 1.25 if delta > 0 else 0.8
+            self.canva.zoom_at(self.canva.mapFromGlobal(QCursor.pos()), factor)
+            return
         change = 2
 
         if delta > 0:
-            self.canva.thickness = min(50, self.canva.thickness + change)
+            self.canva.set_size(min(50, self.canva.thickness + change))
         else:
-            self.canva.thickness = max(2, self.canva.thickness - change)
+            self.canva.set_size(max(2, self.canva.thickness - change))
 
         pos = self.mapFromGlobal(QCursor.pos())
         self.canva.show_size_popup(pos, self.canva.thickness)
-        self.toolbar.btn_size.update()
-        self.canva.update()
 
     # W
     def toggle_board(self):
-        self.canva.drawing_mode = True
+        if not self.canva.drawing_mode:
+            self.canva.set_drawing_mode(True)
+            return
 
         if self.canva.board_color != (0, 0, 0, 50):
-            self.canva.board_color = (0, 0, 0, 50)
+            self.canva.set_board_color((0, 0, 0, 50))
         else:
-            self.canva.board_color = (0, 0, 0, 255)
-        self.canva.update()
+            self.canva.set_board_color((0, 0, 0, 255))
+
+    # SHIFT+W
+    def cycle_template(self):
+        """切換黑板底紋（空白 → 方格 → 橫線 → 點陣），不在黑板模式時順便打開黑板。"""
+        if not self.canva.drawing_mode:
+            self.canva.set_drawing_mode(True)
+        if not self.canva.board_mode():
+            self.canva.set_board_color((0, 0, 0, 255))
+            if self.canva.template != "plain":
+                return
+        self.canva.set_template(next_template(self.canva.template))
 
     # E
     def toggle_eraser(self):
@@ -106,6 +171,8 @@ class Window(QWidget):
             "highlight",
             "eraser",
             "crop_eraser",
+            "laser",
+            "select",
         ]
 
         self.tool_index = tools.index(self.canva.tool)
@@ -133,21 +200,13 @@ class Window(QWidget):
 
         s = shapes[self.shape_index]
         self.canva.set_shape(s)
-        self.toolbar.btn_shape.update()
 
     # C
     def toggle_color(self, reverse=False):
-        colors = [
-            "white",
-            "red",
-            "orange",
-            "yellow",
-            "green",
-            "blue",
-            "purple",
-        ]
+        colors = palette.COLOR_CYCLE
 
-        self.color_index = colors.index(self.canva.color)
+        if self.canva.color in colors:
+            self.color_index = colors.index(self.canva.color)
         if reverse:
             self.color_index = (self.color_index - 1) % len(colors)
         else:
@@ -155,14 +214,13 @@ class Window(QWidget):
 
         c = colors[self.color_index]
         self.canva.set_color(c)
-        self.toolbar.btn_color.update()
 
     # R
-    def set_rectaingle(self):
+    def set_rectaingle(self, color="red"):
         self.canva.set_tool("pen")
         self.canva.set_size(4)
         self.canva.set_shape("rect")
-        self.canva.set_color("red")
+        self.canva.set_color(color)
 
     # F
     def set_pen(self, color=None):
@@ -173,11 +231,11 @@ class Window(QWidget):
             self.canva.set_color(color)
 
     # V
-    def set_highlight(self):
+    def set_highlight(self, color="yellow"):
         self.canva.set_tool("highlight")
         self.canva.set_size(6)
         self.canva.set_shape("free")
-        self.canva.set_color("yellow")
+        self.canva.set_color(color)
 
     # CTRL+S
     def save(self, back=None):
@@ -199,12 +257,115 @@ class Window(QWidget):
         with mss() as sct:
             screenshot = sct.grab(sct.monitors[1])
             to_png(screenshot.rgb, screenshot.size, output=default_path)
-        os.startfile(download)
+        QDesktopServices.openUrl(QUrl.fromLocalFile(download))
 
         self.canva.board_color = old
         self.toolbar.show()
         self.canva.update()
 
+    # CTRL+C / CTRL+SHIFT+C
+    def copy(self, over_screen=False):
+        """
+        直接複製到剪貼簿，不經過 PNG 與硬碟。
+        筆畫都從圖層快取畫出；over_screen 時先藏起整個視窗截下底下的螢幕，
+        再把筆畫疊上去（不會截到邊框、時間軸、放大鏡等介面）。
+        """
+        bg = self.canva.board_color
+        strokes = self.canva.render_image(bg if bg[3] == 255 else None)
+        if not over_screen:
+            QApplication.clipboard().setImage(strokes)
+            return
+
+        g = self.geometry()
+        dpr = self.devicePixelRatioF()
+        region = {
+            "left": round(g.x() * dpr),
+            "top": round(g.y() * dpr),
+            "width": round(g.width() * dpr),
+            "height": round(g.height() * dpr),
+        }
+        self.hide()
+        QApplication.processEvents()
+        time.sleep(HIDE_DELAY)
+        with mss() as sct:
+            shot = sct.grab(region)
+        self.show_overlay()
+
+        w, h = shot.size
+        image = QImage(shot.bgra, w, h, w * 4, QImage.Format_RGB32).copy()
+        image.setDevicePixelRatio(dpr)
+        p = QPainter(image)
+        p.drawImage(0, 0, strokes)
+        p.end()
+        QApplication.clipboard().setImage(image)
+
+    def toggle_drawing(self):
+        self.canva.set_drawing_mode(not self.canva.drawing_mode)
+
+    def set_pass_through(self, on):
+        """穿透模式：滑鼠鍵盤直接交給底下的視窗。"""
+        visible = self.isVisible()
+        self.toolbar.setVisible(not on)
+        if on:
+            self.timeline.hide()
+            # 沒有 pynput 也一定能回來：輪詢修飾鍵
+            self.fallback_hotkey.start()
+        else:
+            self.fallback_hotkey.stop()
+        self.setWindowFlag(Qt.WindowTransparentForInput, on)
+        # 穿透時也不能搶走鍵盤焦點，否則快速鍵會吃掉給底下視窗的按鍵
+        self.setWindowFlag(Qt.WindowDoesNotAcceptFocus, on)
+        self.setAttribute(Qt.WA_ShowWithoutActivating, on)
+        if visible:
+            # 改 window flag 後視窗會被隱藏，需要重新顯示
+            self.show_overlay()
+
+    # CTRL+SHIFT+S
+    def save_session(self):
+        download = os.path.join(os.path.expanduser("~"), "Downloads")
+        save_session(
+            os.path.join(download, "canva_session.json"), self.canva.session_data()
+        )
+
+    # CTRL+O
+    def import_file(self, path=None):
+        """匯入 SVG / JSON 標註，解析在背景執行緒，畫面不會卡住。"""
+        if path is None:
+            download = os.path.join(os.path.expanduser("~"), "Downloads")
+            path, _ = QFileDialog.getOpenFileName(
+                self, "Import strokes", download, "Strokes (*.svg *.json)"
+            )
+        if path:
+            self.importer.start(path)
+
+    def show_overlay(self):
+        if self.testAttribute(Qt.WA_ShowWithoutActivating):
+            # 穿透模式：showFullScreen 會順便 activate，改成只設全螢幕狀態再顯示
+            self.setWindowState(self.windowState() | Qt.WindowFullScreen)
+            self.show()
+            self.raise_()
+            return
+        self.showFullScreen()
+        self.raise_()
+        self.activateWindow()
+
+    def hide_overlay(self):
+        self.magnifier.stop()
+        self.hide()
+
+    def toggle_overlay(self):
+        if self.isVisible():
+            self.hide_overlay()
+        else:
+            self.show_overlay()
+
     # CTRL+R
     def closeEvent(self, event=None):
+        if self.resident:
+            # 常駐模式只隱藏，保留筆畫與歷史
+            if event:
+                event.ignore()
+            self.hide_overlay()
+            return
+
         QApplication.instance().quit()